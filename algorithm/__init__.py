@@ -1,3 +1,6 @@
-from packages.license_plate_recognition.algorithm.config import LicensePlateRecognitionConfig, LicensePlateRecognitionConfigUI
+from packages.license_plate_recognition.algorithm.config import AnnotationConfig, CascadeConfig, EasyOCRConfig, LicensePlateRecognitionConfig, LicensePlateRecognitionConfigUI, MotionGateConfig, QualityConfig
+from packages.license_plate_recognition.algorithm.metrics import Metrics
+from packages.license_plate_recognition.algorithm.models import ModelRegistry, ModelStats
+from packages.license_plate_recognition.algorithm.output import AsyncOutput, close_outputs
 from packages.license_plate_recognition.algorithm.function import LicensePlateRecognitionFunction, LicensePlateRecognitionInput, LicensePlateResult
 from packages.license_plate_recognition.algorithm.pipe import LicensePlateRecognitionPipe
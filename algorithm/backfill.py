@@ -0,0 +1,274 @@
+from __future__ import annotations
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import numpy as np
+import cv2
+import torch
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from packages.license_plate_recognition.algorithm import CascadeConfig, LicensePlateRecognitionConfig
+from packages.license_plate_recognition.algorithm.function import LicensePlateRecognitionFunction
+from packages.license_plate_recognition.algorithm.records import encode_json
+from packages.license_plate_recognition.algorithm.roi import parse_regions
+from packages.license_plate_recognition.data.database import PlateDatabase
+from packages.license_plate_recognition.data.function import LicensePlateRecognitionDataOutput
+from typing import Any, Iterator
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS: tuple[str, ...] = (".mp4", ".mkv", ".avi", ".mov", ".m4v", ".ts", ".webm")
+
+# frame index, position in the video (ms), frame
+Frame = tuple[int, float, np.ndarray]
+
+class FrameReader:
+    # decodes on its own thread ahead of recognition; frames between samples are only grabbed, never decoded
+    def __init__(self, path: str, stride: int, start: int, prefetch: int) -> None:
+        self.capture: cv2.VideoCapture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise OSError(f"Cannot open video {path}")
+        if start:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        self.stride: int = max(1, stride)
+        self.position: int = start
+        self.frames: queue.Queue[Frame | None] = queue.Queue(max(1, prefetch))
+        self.stopped: threading.Event = threading.Event()
+        self.error: BaseException | None = None
+        self.thread: threading.Thread = threading.Thread(target=self.run, name="license-plate-backfill-reader", daemon=True)
+        self.thread.start()
+
+    def put(self, item: Frame | None) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self) -> None:
+        try:
+            while not self.stopped.is_set() and self.capture.grab():
+                index: int = self.position
+                self.position += 1
+                # sampled on the absolute index so a resumed file picks the same frames
+                if index % self.stride:
+                    continue
+                flag, frame = self.capture.retrieve()
+                if flag and not self.put((index, self.capture.get(cv2.CAP_PROP_POS_MSEC), frame)):
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self.put(None)
+
+    def __iter__(self) -> Iterator[Frame]:
+        while True:
+            item: Frame | None = self.frames.get()
+            if item is None:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+        self.capture.release()
+
+def video_files(paths: list[str]) -> list[str]:
+    files: list[str] = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, directories, names in os.walk(path):
+            directories.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(VIDEO_EXTENSIONS))
+    return files
+
+def output_path(directory: str, path: str) -> str:
+    return os.path.join(directory, os.path.splitext(os.path.basename(path))[0] + ".jsonl")
+
+def read_checkpoint(path: str) -> dict[str, Any] | None:
+    try:
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_checkpoint(path: str, state: dict[str, Any]) -> None:
+    # replaced in one step so an interruption leaves either the old or the new checkpoint
+    with open(path + ".tmp", "w") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(path + ".tmp", path)
+
+def load_database(args: argparse.Namespace) -> PlateDatabase | None:
+    if not args.db:
+        return None
+    database: PlateDatabase = PlateDatabase(args.db, args.db + ".delta", args.cache_size)
+    database.refresh()
+    return database
+
+def load_function(args: argparse.Namespace) -> LicensePlateRecognitionFunction:
+    database: PlateDatabase | None = load_database(args)
+    return LicensePlateRecognitionFunction(LicensePlateRecognitionConfig(
+        data=LicensePlateRecognitionDataOutput(names=database.index.names, plates=database.index.plates, index=database.index) if database else None,
+        path_to_models=args.models,
+        expand_x=args.expand,
+        expand_y=args.expand,
+        similarity=args.similarity,
+        annotate=False,
+        backend=args.backend,
+        quantized=args.quantized,
+        rois=parse_regions(args.rois),
+        detector_imgsz=args.imgsz,
+        cascade=CascadeConfig(enabled=args.cascade),
+        preload_models=False,
+    ))
+
+_args: argparse.Namespace | None = None
+_function: LicensePlateRecognitionFunction | None = None
+
+def setup(args: argparse.Namespace) -> None:
+    # once per worker process, every file it is given reuses the loaded models
+    global _args, _function
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    _args = args
+    _function = load_function(args)
+
+def backfill_file(path: str, output: str) -> tuple[str, int, int, float]:
+    # returns the file, its sampled frames, the video frames they cover and the seconds taken
+    args: argparse.Namespace = _args
+    checkpoint_path: str = output + ".checkpoint"
+    state: dict[str, Any] | None = None if args.restart else read_checkpoint(checkpoint_path)
+    if state is not None and state["done"]:
+        return path, 0, 0, 0.0
+    if state is not None and not os.path.exists(output):
+        state = None
+    started: float = time.perf_counter()
+    start: int = state["frame"] if state else 0
+    sampled: int = 0
+    with open(output, "r+b" if state else "wb") as results:
+        if state:
+            # records written after the last checkpoint are read again
+            results.truncate(state["offset"])
+            results.seek(state["offset"])
+        reader: FrameReader = FrameReader(path, args.stride, start, args.prefetch)
+        batch: list[Frame] = []
+        since_checkpoint: int = 0
+
+        def flush() -> None:
+            nonlocal since_checkpoint
+            for (_, position, _), res in zip(batch, _function.recognize_batch([frame for _, _, frame in batch])):
+                if res:
+                    results.write(encode_json({str(timedelta(milliseconds=position)): [license_plate._asdict() for license_plate in res]}))
+            since_checkpoint += len(batch)
+            if since_checkpoint >= args.checkpoint_every:
+                results.flush()
+                os.fsync(results.fileno())
+                write_checkpoint(checkpoint_path, {"frame": batch[-1][0] + 1, "offset": results.tell(), "done": False})
+                since_checkpoint = 0
+            batch.clear()
+
+        try:
+            for item in reader:
+                batch.append(item)
+                sampled += 1
+                if len(batch) >= args.batch:
+                    flush()
+            if batch:
+                flush()
+        finally:
+            reader.close()
+        results.flush()
+        os.fsync(results.fileno())
+        write_checkpoint(checkpoint_path, {"frame": reader.position, "offset": results.tell(), "done": True})
+    return path, sampled, reader.position - start, time.perf_counter() - started
+
+def backfill(args: argparse.Namespace) -> dict[str, Any]:
+    files: list[str] = video_files(args.paths)
+    outputs: list[str] = [output_path(args.output, path) for path in files]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Videos with the same file name would share an output, back them up in separate runs")
+    os.makedirs(args.output, exist_ok=True)
+    # loaded here first so the workers find its snapshot instead of racing to write it
+    load_database(args)
+
+    started: float = time.perf_counter()
+    done: list[tuple[str, int, int, float]] = []
+    failed: list[str] = []
+
+    def finished(path: str, future: Future) -> None:
+        # a broken recording is logged and left without a final checkpoint, the next run tries it again
+        try:
+            done.append(future.result())
+        except Exception:
+            logger.exception("Backfilling %s failed", path)
+            failed.append(path)
+            return
+        logger.info("%s: %d frames in %.1fs", path, done[-1][1], done[-1][3])
+
+    if args.workers <= 1:
+        setup(args)
+        for path, output in zip(files, outputs):
+            future: Future = Future()
+            try:
+                future.set_result(backfill_file(path, output))
+            except Exception as e:
+                future.set_exception(e)
+            finished(path, future)
+    else:
+        # one file per task, so idle workers take the next file and long recordings do not hold up a whole shard
+        with ProcessPoolExecutor(args.workers, multiprocessing.get_context("spawn"), setup, (args,)) as executor:
+            futures: dict[Future, str] = {executor.submit(backfill_file, path, output): path for path, output in zip(files, outputs)}
+            for future in as_completed(futures):
+                finished(futures[future], future)
+    elapsed: float = time.perf_counter() - started
+    frames: int = sum(sampled for _, sampled, _, _ in done)
+    covered: int = sum(covered for _, _, covered, _ in done)
+    return {
+        "files": len(files),
+        "failed": failed,
+        "frames": frames,
+        "video_frames": covered,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "video_fps": covered / elapsed if elapsed else 0.0,
+    }
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Recognise plates in recorded video files, one JSON lines file of results per video")
+    parser.add_argument("paths", nargs="+", help="video files or directories of them")
+    parser.add_argument("--output", required=True, help="directory for the results and their checkpoints")
+    parser.add_argument("--db", default="", help="plate database (guests.json) to match against, plates are only read without it")
+    parser.add_argument("--models", default="./packages/license_plate_recognition/models/")
+    parser.add_argument("--backend", default="torch", help="torch / onnxruntime")
+    parser.add_argument("--quantized", action="store_true")
+    parser.add_argument("--stride", type=int, default=1, help="recognise every n-th frame")
+    parser.add_argument("--batch", type=int, default=8, help="frames per detector call, their plates are read together")
+    parser.add_argument("--prefetch", type=int, default=16, help="decoded frames waiting per video")
+    parser.add_argument("--workers", type=int, default=1, help="processes, each working through its own files")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per process, 0 for the default")
+    parser.add_argument("--checkpoint-every", type=int, default=500, help="sampled frames between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and start every file over")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--rois", default="", help="regions of interest, x,y x,y x,y; ...")
+    parser.add_argument("--expand", type=int, default=0)
+    parser.add_argument("--similarity", type=int, default=90)
+    parser.add_argument("--cascade", action="store_true", help="read greedily first, beam search only uncertain plates")
+    parser.add_argument("--cache-size", type=int, default=4096)
+    args: argparse.Namespace = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report: dict[str, Any] = backfill(args)
+    print(f"{report['files']} files ({len(report['failed'])} failed), {report['frames']} frames ({report['video_frames']} video frames) in {report['seconds']:.1f}s: {report['fps']:.1f} frames/s, {report['video_fps']:.1f} video frames/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+import threading
+import numpy as np
+
+class FramePool:
+    # reusable frame-sized buffers for anything that must not touch the source frame, e.g. annotated previews
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.free: list[np.ndarray] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.allocated: int = 0
+
+    def take(self, shape: tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        with self.lock:
+            buffer: np.ndarray | None = self.free.pop() if self.free else None
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self.allocated += 1
+        return buffer
+
+    def copy(self, frame: np.ndarray) -> np.ndarray:
+        buffer: np.ndarray = self.take(frame.shape, frame.dtype)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        # buffers of dropped jobs are never released, the pool then simply allocates a replacement
+        with self.lock:
+            if len(self.free) < self.size:
+                self.free.append(buffer)
+
+class CropScratch:
+    # the grey crops of one frame, packed back to back into one buffer that only grows
+    def __init__(self, size: int = 1 << 20) -> None:
+        self.buffer: np.ndarray = np.empty(size, dtype=np.uint8)
+        self.used: int = 0
+
+    def reset(self) -> None:
+        self.used = 0
+
+    def take(self, height: int, width: int) -> np.ndarray:
+        size: int = height * width
+        if self.used + size > len(self.buffer):
+            # crops already taken keep the old buffer alive until they are dropped
+            self.buffer = np.empty(max(2 * len(self.buffer), size), dtype=np.uint8)
+            self.used = 0
+        view: np.ndarray = self.buffer[self.used:self.used + size].reshape(height, width)
+        self.used += size
+        return view
@@ -4,6 +4,8 @@ import cv2
 from src.pipe import Pipe, Config, ConfigUI
 from src.ui.pipe.tile import PipeTile
 from typing import Any, Callable, NamedTuple, TYPE_CHECKING
+from packages.license_plate_recognition.algorithm.quality import DEFAULT_LADDER, QualityLevel, format_ladder, parse_ladder
+from packages.license_plate_recognition.algorithm.roi import Polygon, format_regions, parse_regions
 from packages.license_plate_recognition.data import LicensePlateRecognitionDataOutput
 if TYPE_CHECKING:
     from src.manager import Manager
@@ -27,11 +29,40 @@ class AnnotationConfig(NamedTuple):
     known_box_color: tuple[int, int, int] = (0, 255, 0)
     unknown_box_color: tuple[int, int, int] = (0, 0, 255)
     box_thickness: int = 2
+    max_fps: float = 0.0
+    width: int = 0
+    height: int = 0
+    jpeg_quality: int = 95
+    only_changed: bool = False
+
+class MotionGateConfig(NamedTuple):
+    enabled: bool = False
+    method: str = "difference"
+    downscale: float = 0.25
+    pixel_threshold: int = 25
+    min_changed: float = 0.002
+    force_every: int = 25
+    region: tuple[int, int, int, int] | None = None
+    reuse_results: bool = True
+    report_every: int = 1000
+
+class QualityConfig(NamedTuple):
+    enabled: bool = False
+    target_latency: float = 100.0
+    window: int = 30
+    recover: float = 0.7
+    ladder: tuple[QualityLevel, ...] = DEFAULT_LADDER
+
+class CascadeConfig(NamedTuple):
+    enabled: bool = False
+    min_score: float = 0.8
+    min_similarity: float = 100.0
 
 class LicensePlateRecognitionConfig(Config):
     frame_output: Pipe | None = None
     results_output: Pipe | None = None
     attendance_output: Pipe | None = None
+    metrics_output: Pipe | None = None
     data: LicensePlateRecognitionDataOutput | None = None
     path_to_models: str = "./packages/license_plate_recognition/models/"
     sorting_tolerance: float = 0.33
@@ -43,6 +74,37 @@ class LicensePlateRecognitionConfig(Config):
     annotate: bool = True
     annotations: AnnotationConfig = AnnotationConfig()
     ocr_config: EasyOCRConfig = EasyOCRConfig()
+    detection_batch_size: int = 1
+    detection_batch_timeout: int = 5
+    tracking: bool = False
+    tracking_iou: float = 0.3
+    tracking_max_age: int = 15
+    tracking_min_confidence: float = 0.8
+    tracking_reread_interval: float = 2.0
+    motion_gate: MotionGateConfig = MotionGateConfig()
+    async_output: bool = False
+    output_queue_size: int = 2
+    output_backlog: int = 1024
+    preload_models: bool = True
+    model_warmup: int = 1
+    backend: str = "torch"
+    quantized: bool = False
+    metrics_interval: float = 10.0
+    metrics_format: str = "json"
+    rois: tuple[Polygon, ...] = ()
+    detector_imgsz: int = 640
+    ocr_workers: int = 0
+    ocr_worker_threads: int = 1
+    ocr_slots: int = 64
+    ocr_slot_size: int = 262144
+    ocr_pipeline: bool = False
+    buffered_output: bool = False
+    record_format: str = "jsonl"
+    flush_records: int = 100
+    flush_bytes: int = 65536
+    flush_interval: float = 1.0
+    quality: QualityConfig = QualityConfig()
+    cascade: CascadeConfig = CascadeConfig()
 
 class LicensePlateRecognitionConfigUI(ConfigUI):
     def __init__(self, instance: LicensePlateRecognitionPipe, manager: Manager, config_page: ConfigPage) -> None:
@@ -75,6 +137,14 @@ class LicensePlateRecognitionConfigUI(ConfigUI):
                 self.delete_pipe(2),
                 self.instance.config.attendance_output,
             ),
+            PipeTile(
+                "Metrics",
+                self.manager,
+                self.config_page,
+                self.select_pipe,
+                self.delete_pipe(3),
+                self.instance.config.metrics_output,
+            ),
             ft.Dropdown(
                 self.instance.config.data.name if self.instance.config.data else None,
                 label="Data source to use",
@@ -113,6 +183,103 @@ class LicensePlateRecognitionConfigUI(ConfigUI):
             ft.TextField(str(self.instance.config.ocr_config.text_threshold), label="Text Threshold", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
             ft.TextField(str(self.instance.config.ocr_config.low_text), label="Text Low-Bound Score", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
             ft.TextField(str(self.instance.config.ocr_config.link_threshold), label="Link Threshold", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.Container(
+                ft.Text("Shared Detection Batching"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.TextField(str(self.instance.config.detection_batch_size), label="Frames per Detector Batch (1 disables)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.detection_batch_timeout), label="Maximum Batch Wait (ms)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Container(
+                ft.Text("Plate Tracking"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Track Plates across Frames", value=self.instance.config.tracking),
+            ft.TextField(str(self.instance.config.tracking_iou), label="Track Association IoU", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.tracking_max_age), label="Frames before a Lost Track is Dropped", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.tracking_min_confidence), label="OCR Confidence to Stop Re-reading", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.tracking_reread_interval), label="Re-read Interval (s)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.Container(
+                ft.Text("Motion Gate"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Skip Detection on Unchanged Frames", value=self.instance.config.motion_gate.enabled),
+            ft.TextField(self.instance.config.motion_gate.method, label="Method (difference / mog2)", border_color="grey"),
+            ft.TextField(str(self.instance.config.motion_gate.downscale), label="Downscale Factor", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.motion_gate.pixel_threshold), label="Pixel Difference Threshold", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.motion_gate.min_changed), label="Minimum Changed Fraction", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.motion_gate.force_every), label="Force Detection every N Frames", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(",".join(map(str, self.instance.config.motion_gate.region)) if self.instance.config.motion_gate.region else "", label="Region (x1,y1,x2,y2, empty for full frame)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9,]", replacement_string="")),
+            ft.Switch(label="Repeat Previous Results on Skipped Frames", value=self.instance.config.motion_gate.reuse_results),
+            ft.Container(
+                ft.Text("Asynchronous Output"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Encode and Send Outputs off the Inference Thread", value=self.instance.config.async_output),
+            ft.TextField(str(self.instance.config.output_queue_size), label="Queued Preview Frames (oldest dropped)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.output_backlog), label="Queued Results / Attendance (never dropped)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Container(
+                ft.Text("Models"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Load Models in the Background on Play", value=self.instance.config.preload_models),
+            ft.TextField(str(self.instance.config.model_warmup), label="Warm-up Passes", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(self.instance.config.backend, label="Backend (torch / onnxruntime, needs exported models)", border_color="grey"),
+            ft.Switch(label="Use INT8 Quantized ONNX Models", value=self.instance.config.quantized),
+            ft.Container(
+                ft.Text("Metrics"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.TextField(str(self.instance.config.metrics_interval), label="Snapshot Interval (s)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(self.instance.config.metrics_format, label="Snapshot Format (json / prometheus)", border_color="grey"),
+            ft.Container(
+                ft.Text("Detection Regions"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.TextField(format_regions(self.instance.config.rois), label="Regions of Interest (x,y x,y x,y; ... empty for full frame)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9, ;]", replacement_string="")),
+            ft.TextField(str(self.instance.config.detector_imgsz), label="Detector Input Size", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Container(
+                ft.Text("OCR Worker Processes"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.TextField(str(self.instance.config.ocr_workers), label="Worker Processes (0 reads in this process)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.ocr_worker_threads), label="Torch Threads per Worker", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.ocr_slots), label="Shared Memory Crop Slots", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.ocr_slot_size), label="Slot Size (bytes, larger crops are shrunk)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Switch(label="Overlap OCR with Detection of the Next Frame (outputs lag one frame)", value=self.instance.config.ocr_pipeline),
+            ft.Container(
+                ft.Text("Buffered Records"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Buffer Results and Attendance Records", value=self.instance.config.buffered_output),
+            ft.TextField(self.instance.config.record_format, label="Record Format (jsonl / binary)", border_color="grey"),
+            ft.TextField(str(self.instance.config.flush_records), label="Flush after Records", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.flush_bytes), label="Flush after Bytes", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.flush_interval), label="Flush after Seconds", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.Container(
+                ft.Text("Adaptive Quality"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Lower Quality to Hold the Target Latency", value=self.instance.config.quality.enabled),
+            ft.TextField(str(self.instance.config.quality.target_latency), label="Target Latency per Frame (ms, 1000 / FPS)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.quality.window), label="Frames per Decision", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.quality.recover), label="Raise Quality below Fraction of Target", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(format_ladder(self.instance.config.quality.ladder), label="Ladder (decoder,beam width,detector size,preview; ... empty or 0 keeps the setting)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[a-z0-9, ;]", replacement_string="")),
+            ft.Container(
+                ft.Text("Cascaded OCR"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.Switch(label="Read Greedy First, Beam Search only Uncertain Plates", value=self.instance.config.cascade.enabled),
+            ft.TextField(str(self.instance.config.cascade.min_score), label="Minimum Greedy OCR Score", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.cascade.min_similarity), label="Minimum Similarity to a Registered Plate", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.Container(
+                ft.Text("Preview"),
+                padding=ft.padding.symmetric(vertical=20),
+            ),
+            ft.TextField(str(self.instance.config.annotations.max_fps), label="Maximum Preview FPS (0 for every frame)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(str(self.instance.config.annotations.width), label="Preview Width (0 keeps the aspect ratio or full size)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.annotations.height), label="Preview Height (0 keeps the aspect ratio or full size)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.TextField(str(self.instance.config.annotations.jpeg_quality), label="JPEG Quality (0-100)", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Switch(label="Only Send a Preview when the Detections Change", value=self.instance.config.annotations.only_changed),
         ])
 
     def refresh_data_options(self, update: bool = True):
@@ -138,30 +305,87 @@ class LicensePlateRecognitionConfigUI(ConfigUI):
             frame_output=self.content.controls[0].instance,
             results_output=self.content.controls[1].instance,
             attendance_output=self.content.controls[2].instance,
-            data=self.manager.data[self.content.controls[3].value] if self.content.controls[3].value else None,
-            path_to_models=self.content.controls[4].value,
-            expand_x=int(self.content.controls[5].value),
-            expand_y=int(self.content.controls[6].value),
-            min_text_percentage=float(self.content.controls[7].value),
-            sorting_tolerance=float(self.content.controls[8].value),
-            similarity=int(self.content.controls[9].value),
-            attendance_interval=int(self.content.controls[10].value),
-            annotate=self.content.controls[11].value,
+            metrics_output=self.content.controls[3].instance,
+            data=self.manager.data[self.content.controls[4].value] if self.content.controls[4].value else None,
+            path_to_models=self.content.controls[5].value,
+            expand_x=int(self.content.controls[6].value),
+            expand_y=int(self.content.controls[7].value),
+            min_text_percentage=float(self.content.controls[8].value),
+            sorting_tolerance=float(self.content.controls[9].value),
+            similarity=int(self.content.controls[10].value),
+            attendance_interval=int(self.content.controls[11].value),
+            annotate=self.content.controls[12].value,
             annotations=AnnotationConfig(
-                known_box_color=tuple(bytes.fromhex(self.content.controls[13].value)),
-                unknown_box_color=tuple(bytes.fromhex(self.content.controls[14].value)),
-                box_thickness=int(self.content.controls[15].value),
-                text_scale=float(self.content.controls[16].value),
-                text_thickness=int(self.content.controls[17].value),
-                padding=int(self.content.controls[18].value),
+                known_box_color=tuple(bytes.fromhex(self.content.controls[14].value)),
+                unknown_box_color=tuple(bytes.fromhex(self.content.controls[15].value)),
+                box_thickness=int(self.content.controls[16].value),
+                text_scale=float(self.content.controls[17].value),
+                text_thickness=int(self.content.controls[18].value),
+                padding=int(self.content.controls[19].value),
+                max_fps=float(self.content.controls[84].value),
+                width=int(self.content.controls[85].value),
+                height=int(self.content.controls[86].value),
+                jpeg_quality=int(self.content.controls[87].value),
+                only_changed=self.content.controls[88].value,
             ),
             ocr_config=EasyOCRConfig(
-                decoder=self.content.controls[20].value,
-                allowlist=self.content.controls[21].value,
-                beamWidth=int(self.content.controls[22].value),
-                batch_size=int(self.content.controls[23].value),
-                text_threshold=float(self.content.controls[24].value),
-                low_text=float(self.content.controls[25].value),
-                link_threshold=float(self.content.controls[26].value),
+                decoder=self.content.controls[21].value,
+                allowlist=self.content.controls[22].value,
+                beamWidth=int(self.content.controls[23].value),
+                batch_size=int(self.content.controls[24].value),
+                text_threshold=float(self.content.controls[25].value),
+                low_text=float(self.content.controls[26].value),
+                link_threshold=float(self.content.controls[27].value),
+            ),
+            detection_batch_size=int(self.content.controls[29].value),
+            detection_batch_timeout=int(self.content.controls[30].value),
+            tracking=self.content.controls[32].value,
+            tracking_iou=float(self.content.controls[33].value),
+            tracking_max_age=int(self.content.controls[34].value),
+            tracking_min_confidence=float(self.content.controls[35].value),
+            tracking_reread_interval=float(self.content.controls[36].value),
+            motion_gate=MotionGateConfig(
+                enabled=self.content.controls[38].value,
+                method=self.content.controls[39].value,
+                downscale=float(self.content.controls[40].value),
+                pixel_threshold=int(self.content.controls[41].value),
+                min_changed=float(self.content.controls[42].value),
+                force_every=int(self.content.controls[43].value),
+                region=tuple(int(value) for value in self.content.controls[44].value.split(",")) if self.content.controls[44].value else None,
+                reuse_results=self.content.controls[45].value,
+                report_every=self.instance.config.motion_gate.report_every,
+            ),
+            async_output=self.content.controls[47].value,
+            output_queue_size=int(self.content.controls[48].value),
+            output_backlog=int(self.content.controls[49].value),
+            preload_models=self.content.controls[51].value,
+            model_warmup=int(self.content.controls[52].value),
+            backend=self.content.controls[53].value,
+            quantized=self.content.controls[54].value,
+            metrics_interval=float(self.content.controls[56].value),
+            metrics_format=self.content.controls[57].value,
+            rois=parse_regions(self.content.controls[59].value),
+            detector_imgsz=int(self.content.controls[60].value),
+            ocr_workers=int(self.content.controls[62].value),
+            ocr_worker_threads=int(self.content.controls[63].value),
+            ocr_slots=int(self.content.controls[64].value),
+            ocr_slot_size=int(self.content.controls[65].value),
+            ocr_pipeline=self.content.controls[66].value,
+            buffered_output=self.content.controls[68].value,
+            record_format=self.content.controls[69].value,
+            flush_records=int(self.content.controls[70].value),
+            flush_bytes=int(self.content.controls[71].value),
+            flush_interval=float(self.content.controls[72].value),
+            quality=QualityConfig(
+                enabled=self.content.controls[74].value,
+                target_latency=float(self.content.controls[75].value),
+                window=int(self.content.controls[76].value),
+                recover=float(self.content.controls[77].value),
+                ladder=parse_ladder(self.content.controls[78].value),
+            ),
+            cascade=CascadeConfig(
+                enabled=self.content.controls[80].value,
+                min_score=float(self.content.controls[81].value),
+                min_similarity=float(self.content.controls[82].value),
             ),
         )
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import argparse
+import logging
+import os
+import numpy as np
+import cv2
+import easyocr
+# exporting needs the optional ONNX packages: pip install -r requirements-onnx.txt
+import onnx
+import torch
+from easyocr.imgproc import normalizeMeanVariance, resize_aspect_ratio
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from ultralytics import YOLO
+from packages.license_plate_recognition.algorithm.runtime import DETECTOR, TEXT_DETECTOR, TEXT_RECOGNIZER, model_file
+from typing import Callable, Iterator
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+OPSET: int = 17
+
+class RecognizerGraph(torch.nn.Module):
+    # EasyOCR passes a dummy text tensor the CTC recognizer never reads, keep it out of the graph
+    def __init__(self, recognizer: torch.nn.Module) -> None:
+        super().__init__()
+        self.recognizer: torch.nn.Module = recognizer
+
+    def forward(self, image: torch.Tensor) -> torch.Tensor:
+        return self.recognizer(image, None)
+
+class CalibrationImages(CalibrationDataReader):
+    def __init__(self, input_name: str, inputs: Iterator[np.ndarray]) -> None:
+        self.input_name: str = input_name
+        self.inputs: Iterator[np.ndarray] = inputs
+
+    def get_next(self) -> dict[str, np.ndarray] | None:
+        image: np.ndarray | None = next(self.inputs, None)
+        return None if image is None else {self.input_name: image}
+
+def unwrap(module: torch.nn.Module) -> torch.nn.Module:
+    return module.module if isinstance(module, torch.nn.DataParallel) else module
+
+def load_images(directory: str, limit: int) -> list[np.ndarray]:
+    images: list[np.ndarray] = []
+    for name in sorted(os.listdir(directory)):
+        image: np.ndarray | None = cv2.imread(os.path.join(directory, name))
+        if image is not None:
+            images.append(image)
+        if len(images) >= limit:
+            break
+    return images
+
+def detector_inputs(images: list[np.ndarray], imgsz: int) -> Iterator[np.ndarray]:
+    # the same letterbox ultralytics applies before inference
+    for image in images:
+        scale: float = imgsz / max(image.shape[:2])
+        resized: np.ndarray = cv2.resize(image, (round(image.shape[1] * scale), round(image.shape[0] * scale)))
+        canvas: np.ndarray = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+        top: int = (imgsz - resized.shape[0]) // 2
+        left: int = (imgsz - resized.shape[1]) // 2
+        canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+        yield (canvas[:, :, ::-1].transpose(2, 0, 1)[None] / 255.0).astype(np.float32)
+
+def text_detector_inputs(images: list[np.ndarray], canvas_size: int) -> Iterator[np.ndarray]:
+    for image in images:
+        resized, _, _ = resize_aspect_ratio(image, canvas_size, interpolation=cv2.INTER_LINEAR, mag_ratio=1.0)
+        yield normalizeMeanVariance(resized).transpose(2, 0, 1)[None].astype(np.float32)
+
+def recognizer_inputs(images: list[np.ndarray], height: int) -> Iterator[np.ndarray]:
+    for image in images:
+        grey: np.ndarray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        width: int = max(1, round(grey.shape[1] * height / grey.shape[0]))
+        yield ((cv2.resize(grey, (width, height)) / 255.0 - 0.5) / 0.5)[None, None].astype(np.float32)
+
+def export_detector(path_to_models: str, imgsz: int) -> str:
+    detector: YOLO = YOLO(model_file(path_to_models, DETECTOR, "torch"))
+    exported: str = detector.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, opset=OPSET)
+    output: str = model_file(path_to_models, DETECTOR, "onnx")
+    if os.path.abspath(exported) != os.path.abspath(output):
+        os.replace(exported, output)
+    return output
+
+def export_reader(path_to_models: str, canvas_size: int) -> tuple[str, str]:
+    reader: easyocr.Reader = easyocr.Reader(['en'], model_storage_directory=path_to_models, gpu=False)
+    text_detector: str = model_file(path_to_models, TEXT_DETECTOR, "onnx")
+    torch.onnx.export(
+        unwrap(reader.detector).eval(),
+        torch.zeros(1, 3, canvas_size, canvas_size),
+        text_detector,
+        input_names=["image"],
+        output_names=["score", "feature"],
+        dynamic_axes={
+            "image": {0: "batch", 2: "height", 3: "width"},
+            "score": {0: "batch", 1: "score_height", 2: "score_width"},
+            "feature": {0: "batch", 2: "feature_height", 3: "feature_width"},
+        },
+        opset_version=OPSET,
+    )
+    recognizer: str = model_file(path_to_models, TEXT_RECOGNIZER, "onnx")
+    torch.onnx.export(
+        RecognizerGraph(unwrap(reader.recognizer)).eval(),
+        torch.zeros(1, 1, 64, 256),
+        recognizer,
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": {0: "batch", 3: "width"}, "logits": {0: "batch", 1: "steps"}},
+        opset_version=OPSET,
+    )
+    return text_detector, recognizer
+
+def quantize(path: str, output: str, inputs: Iterator[np.ndarray]) -> str:
+    source: onnx.ModelProto = onnx.load(path)
+    prepared: str = output + ".prepared"
+    quant_pre_process(path, prepared, skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            prepared,
+            output,
+            CalibrationImages(source.graph.input[0].name, inputs),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    finally:
+        os.remove(prepared)
+    # ultralytics reads the class names, stride and image size of an exported detector from the metadata
+    quantized: onnx.ModelProto = onnx.load(output)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, output)
+    return output
+
+def export(path_to_models: str, imgsz: int = 640, canvas_size: int = 640, crops: str = "", frames: str = "", limit: int = 200) -> list[str]:
+    detector: str = export_detector(path_to_models, imgsz)
+    text_detector, recognizer = export_reader(path_to_models, canvas_size)
+    exported: list[str] = [detector, text_detector, recognizer]
+    if crops:
+        plate_crops: list[np.ndarray] = load_images(crops, limit)
+        # the detector sees whole frames, fall back to letterboxed crops when no frames are given
+        detector_images: list[np.ndarray] = load_images(frames, limit) if frames else plate_crops
+        calibrations: list[tuple[str, str, Callable[[], Iterator[np.ndarray]]]] = [
+            (detector, DETECTOR, lambda: detector_inputs(detector_images, imgsz)),
+            (text_detector, TEXT_DETECTOR, lambda: text_detector_inputs(plate_crops, canvas_size)),
+            (recognizer, TEXT_RECOGNIZER, lambda: recognizer_inputs(plate_crops, 64)),
+        ]
+        for path, name, inputs in calibrations:
+            exported.append(quantize(path, model_file(path_to_models, name, "onnx-int8"), inputs()))
+    for path in exported:
+        logger.info("Exported %s (%.1f MiB)", path, os.path.getsize(path) / 2 ** 20)
+    return exported
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Export the plate detector and EasyOCR models to ONNX, optionally with static INT8 quantisation")
+    parser.add_argument("--models", default="./packages/license_plate_recognition/models/")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--canvas-size", type=int, default=640)
+    parser.add_argument("--crops", default="", help="directory of plate crops to calibrate INT8 models with, quantisation is skipped without it")
+    parser.add_argument("--frames", default="", help="directory of full frames to calibrate the plate detector with")
+    parser.add_argument("--limit", type=int, default=200, help="calibration images per model")
+    args: argparse.Namespace = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for path in export(args.models, args.imgsz, args.canvas_size, args.crops, args.frames, args.limit):
+        print(path)
+
+if __name__ == "__main__":
+    main()
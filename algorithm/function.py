@@ -3,14 +3,32 @@ from ultralytics import YOLO
 from datetime import datetime, timedelta
 import numpy as np
 import json
+import logging
+import threading
+import time
 import cv2
 import easyocr
-import torch
-import rapidfuzz
-from packages.license_plate_recognition.algorithm import LicensePlateRecognitionConfig
+from concurrent.futures import Future
+from packages.license_plate_recognition.algorithm import EasyOCRConfig, LicensePlateRecognitionConfig
+from packages.license_plate_recognition.algorithm.buffers import CropScratch, FramePool
+from packages.license_plate_recognition.algorithm.metrics import Metrics, to_json, to_prometheus
+from packages.license_plate_recognition.algorithm.models import ModelRegistry, default_device, model_variant
+from packages.license_plate_recognition.algorithm.motion import MotionGate
+from packages.license_plate_recognition.algorithm.output import AsyncOutput, register, unregister
+from packages.license_plate_recognition.algorithm.ocr import assemble_text, crop_plate, read_batch
+from packages.license_plate_recognition.algorithm.ocr_pool import OCRPool
+from packages.license_plate_recognition.algorithm.quality import QualityController, QualityLevel
+from packages.license_plate_recognition.algorithm.records import Cooldown, RecordWriter
+from packages.license_plate_recognition.algorithm.roi import Detection, Region, map_detections
+from packages.license_plate_recognition.algorithm.scheduler import DetectionScheduler
+from packages.license_plate_recognition.algorithm.tracker import PlateTracker, Track
 from packages.license_plate_recognition.common import double_replace
+from packages.license_plate_recognition.matcher import PlateIndex
+from packages.license_plate_recognition.data import PlateDatabase
 from src.pipe.function import IO, Function
-from typing import Any, NamedTuple
+from typing import Any, Callable, NamedTuple
+
+logger: logging.Logger = logging.getLogger(__name__)
 
 class LicensePlateRecognitionInput(IO):
     frame: np.ndarray # = np.array([[[0, 0, 0]]])
@@ -23,6 +41,7 @@ class LicensePlateResult(NamedTuple):
     ocr_score: float # = 0.0
     similarity_score: float # = 0.0
     box: tuple[int, int, int, int] # = (0, 0, 0, 0)
+    track_id: int = -1
 
 class BytesOutput(IO):
     data: bytes # = b""
@@ -32,72 +51,258 @@ class LicensePlateRecognitionFunction(Function):
 
     def __init__(self, config: LicensePlateRecognitionConfig) -> None:
         self.config: LicensePlateRecognitionConfig = config
-        self.license_plate_detector: YOLO = YOLO(self.config.path_to_models + "license_plate_detector.pt")
-        if torch.cuda.is_available():
-            self.license_plate_detector.to('cuda')
-            self.reader: easyocr.Reader = easyocr.Reader(['en'], model_storage_directory=self.config.path_to_models, gpu=True)
+        # what the adaptive quality controller may turn down, starting from the configured values
+        self.ocr_config: EasyOCRConfig = self.config.ocr_config
+        self.detector_imgsz: int = self.config.detector_imgsz
+        self.preview: bool = True
+        self.quality: QualityController | None = QualityController(self.config.quality) if self.config.quality.enabled else None
+        if self.config.detection_batch_size > 1:
+            self.scheduler: DetectionScheduler | None = self.get_scheduler()
         else:
-            self.reader: easyocr.Reader = easyocr.Reader(['en'], model_storage_directory=self.config.path_to_models, gpu=False)
+            self.scheduler: DetectionScheduler | None = None
+            self.license_plate_detector: YOLO = ModelRegistry.detector(self.config)
+        self.ocr_pool: OCRPool | None = OCRPool.get(self.config) if self.config.ocr_workers > 0 else None
+        # with worker processes reading, this process never needs a reader of its own
+        self.reader: easyocr.Reader | None = ModelRegistry.reader(self.config) if self.ocr_pool is None else None
+        self.pending: tuple[np.ndarray | None, Callable[[], list[LicensePlateResult]] | None] | None = None
+        # stop may come from another thread while a frame is in flight
+        self.lock: threading.Lock = threading.Lock()
+        self.scratch: CropScratch = CropScratch()
+        self.spare: CropScratch = CropScratch()
+        # plates resolved by the greedy read and by the beam search re-read of the cascade
+        self.tiers: dict[str, int] = {"greedy": 0, "beamsearch": 0}
+        # one buffer per preview that can be queued, being encoded or held back for the pipelined OCR
+        self.frames: FramePool = FramePool(self.config.output_queue_size + 2)
+        # downscaled previews have a pool of their own so neither pool keeps reallocating between two sizes
+        self.previews: FramePool = FramePool(self.config.output_queue_size + 2)
+        self.jpeg_parameters: list[int] = [cv2.IMWRITE_JPEG_QUALITY, self.config.annotations.jpeg_quality]
+        self.text_sizes: dict[str, tuple[int, int]] = {}
+        self.next_preview: float = 0.0
+        self.previewed: tuple[tuple[str, bool], ...] | None = None
+        self.regions: list[Region] = [Region(polygon) for polygon in self.config.rois]
 
         if self.config.data:
             self.names: list[str] = self.config.data.names
             self.plates: list[str] = self.config.data.plates
+            self.index: PlateIndex = self.config.data.index if self.config.data.index else PlateIndex(self.names, self.plates)
+            self.database: PlateDatabase | None = self.config.data.database
+            if self.database:
+                self.database.acquire()
             self.no_data: bool = False
         else:
+            self.database: PlateDatabase | None = None
             self.no_data: bool = True
-        self.latest: dict[str, datetime] = {}
+        # names attended within the interval, older ones are evicted instead of piling up forever
+        self.latest: Cooldown = Cooldown(timedelta(seconds=self.config.attendance_interval))
+        self.tracker: PlateTracker | None = PlateTracker(
+            self.config.tracking_iou,
+            self.config.tracking_max_age,
+            self.config.tracking_min_confidence,
+            self.config.tracking_reread_interval,
+        ) if self.config.tracking else None
+        self.motion_gate: MotionGate | None = MotionGate(self.config.motion_gate) if self.config.motion_gate.enabled else None
+        self.previous: list[LicensePlateResult] = []
         self.frame_output = self.config.frame_output.cls_function(self.config.frame_output.config) if self.config.frame_output else None
         self.results_output = self.config.results_output.cls_function(self.config.results_output.config) if self.config.results_output else None
         self.attendance_output = self.config.attendance_output.cls_function(self.config.attendance_output.config) if self.config.attendance_output else None
+        self.metrics_output = self.config.metrics_output.cls_function(self.config.metrics_output.config) if self.config.metrics_output else None
+        self.metrics: Metrics = Metrics(self.metrics_output is not None, self.config.metrics_interval)
+        self.async_output: AsyncOutput | None = AsyncOutput(self.config, self.config.output_queue_size, self.config.output_backlog) if self.config.async_output else None
+        # created after the async output so stopping flushes them into it before it is drained
+        self.results_writer: RecordWriter | None = self.writer("results", self.results_output)
+        self.attendance_writer: RecordWriter | None = self.writer("attendance", self.attendance_output)
+        # closed by LicensePlateRecognitionPipe.stop, before anything registered above
+        register(self)
 
-    def __call__(self, input: LicensePlateRecognitionInput) -> IO:
-        license_detections = self.license_plate_detector(input.frame.copy(), verbose=False)[0]
-        res: list[LicensePlateResult] = []
-        if len(license_detections.boxes.cls.tolist()) != 0:
-            expand_x: int = self.config.expand_x
-            expand_y: int = self.config.expand_y
-            ocr_config: dict[str, Any] = self.config.ocr_config._asdict()
-            for license_plate in license_detections.boxes.data.tolist():
-                x1, y1, x2, y2, score, class_id = license_plate
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-
-                ocr_scores: float = 0.0
-                plate: list[str] = []
-                cropped = cv2.cvtColor(input.frame[int(y1) - expand_y:int(y2) + expand_y, int(x1) - expand_x: int(x2) + expand_x, :], cv2.COLOR_BGR2GRAY)
-
-                detections = self.reader.readtext(cropped, **ocr_config)
-                if detections:
-                    box_size: int = cropped.shape[0]*cropped.shape[1]
-                    sorted_detections = sorted( detections, key=lambda result:(int(result[0][0][1]/cropped.shape[1]/self.config.sorting_tolerance), result[0][0][0]) )
-
-                    for (box, text, det_score) in sorted_detections:
-                        if np.sum(np.subtract(box[1], box[0]))*np.sum(np.subtract(box[2], box[1])) / box_size > self.config.min_text_percentage:
-                            ocr_scores += det_score
-                            plate.append(text.upper())
-                license_plate_text: str = "".join(plate)
-                if len(plate) != 0 : 
-                    license_plate_text_score: float = ocr_scores/len(plate)
-                else :
-                    license_plate_text_score: float = 0.0
-
-                label: str = ""
-                known: bool = False
-                similarity: float = 0.0
-                if license_plate_text:
-                    license_plate_text: str = str(license_plate_text)
-                    if not self.no_data:
-                        fuzzed = rapidfuzz.process.extractOne(double_replace(license_plate_text), self.plates)
-                        similarity: float = fuzzed[1]
-                        if fuzzed[1] > self.config.similarity:
-                            label: str = self.names[fuzzed[2]]
-                            known: bool = True
-                        else:
-                            label: str = license_plate_text
-                    else:
-                        label: str = license_plate_text
-                else:
-                    license_plate_text: str = ""
+    def get_scheduler(self) -> DetectionScheduler:
+        return DetectionScheduler.get(
+            (self.config.path_to_models, default_device(), model_variant(self.config)),
+            lambda: ModelRegistry.detector(self.config),
+            self.config.detection_batch_size,
+            self.config.detection_batch_timeout,
+            self.detector_imgsz,
+        )
+
+    def apply(self, level: QualityLevel) -> None:
+        self.ocr_config = self.config.ocr_config._replace(
+            decoder=level.decoder or self.config.ocr_config.decoder,
+            beamWidth=level.beam_width or self.config.ocr_config.beamWidth,
+        )
+        self.detector_imgsz = level.detector_imgsz or self.config.detector_imgsz
+        self.preview = level.preview
+        if self.scheduler:
+            # schedulers are shared per input size, other streams keep batching at theirs
+            self.scheduler = self.get_scheduler()
+        self.metrics.gauge("quality_level", self.quality.level)
+
+    def writer(self, name: str, sink: Function | None) -> RecordWriter | None:
+        if sink is None or not self.config.buffered_output:
+            return None
+        return RecordWriter(
+            self.config,
+            lambda data: self.send(name, sink, lambda: BytesOutput(data=data)),
+            self.config.record_format,
+            self.config.flush_records,
+            self.config.flush_bytes,
+            self.config.flush_interval,
+        )
+
+    def match(self, license_plate_text: str) -> tuple[str, bool, float]:
+        if not license_plate_text or self.no_data:
+            return license_plate_text, False, 0.0
+        with self.metrics.span("match"):
+            index, similarity = self.index.extract(double_replace(license_plate_text), self.config.similarity)
+        if similarity > self.config.similarity:
+            self.metrics.count("known")
+            return self.index.names[index], True, similarity
+        self.metrics.count("unknown")
+        return license_plate_text, False, similarity
+
+    def detect_images(self, images: list[np.ndarray]) -> list[Any]:
+        if self.scheduler:
+            return self.scheduler.detect(images)
+        return self.license_plate_detector(images, verbose=False, imgsz=self.detector_imgsz)
+
+    def detect(self, frame: np.ndarray) -> list[Detection]:
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[list[Detection]]:
+        if not self.regions:
+            return [result.boxes.data.tolist() for result in self.detect_images(frames)]
+        # the regions of every frame go to the detector together, then are split back per frame
+        crops: list[tuple[np.ndarray, tuple[int, int]]] = [region.crop(frame) for frame in frames for region in self.regions]
+        # YOLO rejects empty images, so regions outside the frame are skipped and report no plates
+        results: list[Any | None] = [None] * len(crops)
+        filled: list[int] = [position for position, (crop, _) in enumerate(crops) if crop.size]
+        if filled:
+            for position, result in zip(filled, self.detect_images([crops[position][0] for position in filled])):
+                results[position] = result
+        count: int = len(self.regions)
+        return [
+            map_detections(self.regions, [offset for _, offset in crops[start:start + count]], results[start:start + count])
+            for start in range(0, len(crops), count)
+        ]
+
+    def confident(self, license_plate_text: str, license_plate_text_score: float) -> bool:
+        # a greedy read is kept when it is sure of itself and already names a registered plate
+        if not license_plate_text or license_plate_text_score < self.config.cascade.min_score:
+            return False
+        _, similarity = self.index.extract(double_replace(license_plate_text), self.config.cascade.min_similarity)
+        return similarity >= self.config.cascade.min_similarity
+
+    def read_async(self, frame: np.ndarray, boxes: list[tuple[int, int, int, int]]) -> Callable[[], list[tuple[str, float]]]:
+        with self.metrics.span("crop"):
+            # crops stay valid until the frame after next, a pipelined cascade re-reads them while this frame is cropped
+            self.scratch, self.spare = self.spare, self.scratch
+            self.scratch.reset()
+            crops: list[np.ndarray] = [crop_plate(frame, box, self.config.expand_x, self.config.expand_y, self.scratch) for box in boxes]
+        return self.read_plates(crops)
+
+    def read_plates(self, crops: list[np.ndarray]) -> Callable[[], list[tuple[str, float]]]:
+        self.metrics.count("ocr_calls", len(crops))
+        # without plates to compare against nothing could exit early, and a greedy quality level has nothing to escalate to
+        if not self.config.cascade.enabled or self.no_data or self.ocr_config.decoder == "greedy":
+            return self.read_crops(crops, self.ocr_config)
+        first: Callable[[], list[tuple[str, float]]] = self.read_crops(crops, self.ocr_config._replace(decoder="greedy", beamWidth=1))
+
+        def escalate() -> list[tuple[str, float]]:
+            texts: list[tuple[str, float]] = list(first())
+            uncertain: list[int] = [count for count, (text, score) in enumerate(texts) if not self.confident(text, score)]
+            self.tiers["greedy"] += len(texts) - len(uncertain)
+            self.tiers["beamsearch"] += len(uncertain)
+            self.metrics.count("ocr_greedy", len(texts) - len(uncertain))
+            self.metrics.count("ocr_beamsearch", len(uncertain))
+            if uncertain:
+                for count, read in zip(uncertain, self.read_crops([crops[count] for count in uncertain], self.ocr_config)()):
+                    texts[count] = read
+            return texts
+        return escalate
+
+    def read_crops(self, crops: list[np.ndarray], ocr_config: EasyOCRConfig) -> Callable[[], list[tuple[str, float]]]:
+        if self.ocr_pool and self.ocr_pool.error is not None:
+            # the reads in flight failed with the old pool, later frames go to a fresh one
+            self.ocr_pool.release()
+            self.ocr_pool = OCRPool.get(self.config)
+        if self.ocr_pool:
+            # every crop is its own task, so the plates of one frame spread over all workers
+            futures: list[Future] = [self.ocr_pool.submit(crop, ocr_config.decoder, ocr_config.beamWidth) for crop in crops]
 
+            def gather() -> list[tuple[str, float]]:
+                with self.metrics.span("ocr"):
+                    return [future.result() for future in futures]
+            return gather
+        with self.metrics.span("ocr"):
+            texts: list[tuple[str, float]] = [
+                assemble_text(detections, cropped.shape, self.config.sorting_tolerance, self.config.min_text_percentage)
+                for cropped, detections in zip(crops, read_batch(self.reader, crops, ocr_config))
+            ]
+        return lambda: texts
+
+    def recognize_tracked(self, frame: np.ndarray, boxes: list[tuple[int, int, int, int]], scores: list[float]) -> Callable[[], list[LicensePlateResult]]:
+        now: float = time.monotonic()
+        tracks: list[Track] = self.tracker.update(boxes)
+        to_read: list[Track] = [track for track in tracks if self.tracker.needs_read(track, now)]
+        for track in to_read:
+            track.reading = True
+        reads: Callable[[], list[tuple[str, float]]] = self.read_async(frame, [track.box for track in to_read])
+
+        def finish() -> list[LicensePlateResult]:
+            try:
+                texts: list[tuple[str, float]] = reads()
+            finally:
+                for track in to_read:
+                    track.reading = False
+            for track, (license_plate_text, license_plate_text_score) in zip(to_read, texts):
+                self.tracker.vote(track, license_plate_text, license_plate_text_score, now)
+
+            res: list[LicensePlateResult] = []
+            # boxes come from this frame, the tracks may already have moved on to the next one
+            for track, box, score in zip(tracks, boxes, scores):
+                # a track handed over to another plate reports that plate from this frame on
+                track = track.latest()
+                if track.matched != track.license_plate:
+                    track.label, track.known, track.similarity = self.match(track.license_plate)
+                    track.matched = track.license_plate
+                res.append(LicensePlateResult(
+                    label=track.label,
+                    license_plate=track.license_plate,
+                    known=track.known,
+                    detection_score=score,
+                    ocr_score=track.ocr_score,
+                    similarity_score=track.similarity,
+                    box=box,
+                    track_id=track.track_id,
+                ))
+            return res
+        return finish
+
+    def start(self, frame: np.ndarray) -> Callable[[], list[LicensePlateResult]]:
+        # detects and hands the crops to OCR, the returned callable waits for the reads and matches them
+        if self.database:
+            # pick up the latest swapped-in index once per frame so every plate of the frame sees the same data
+            self.index = self.database.index
+        with self.metrics.span("detect"):
+            # the detector letterboxes into its own input tensor and never writes to the frame
+            license_detections: list[Detection] = self.detect(frame)
+        self.metrics.count("detections", len(license_detections))
+        if len(license_detections) == 0:
+            if self.tracker:
+                self.tracker.update([])
+            return lambda: []
+        boxes: list[tuple[int, int, int, int]] = []
+        scores: list[float] = []
+        for license_plate in license_detections:
+            x1, y1, x2, y2, score, class_id = license_plate
+            boxes.append((int(x1), int(y1), int(x2), int(y2)))
+            scores.append(score)
+        if self.tracker:
+            return self.recognize_tracked(frame, boxes, scores)
+        reads: Callable[[], list[tuple[str, float]]] = self.read_async(frame, boxes)
+
+        def finish() -> list[LicensePlateResult]:
+            res: list[LicensePlateResult] = []
+            for box, score, (license_plate_text, license_plate_text_score) in zip(boxes, scores, reads()):
+                label, known, similarity = self.match(license_plate_text)
                 res.append(LicensePlateResult(
                     label=label,
                     license_plate=license_plate_text,
@@ -105,46 +310,266 @@ class LicensePlateRecognitionFunction(Function):
                     detection_score=score,
                     ocr_score=license_plate_text_score,
                     similarity_score=similarity,
-                    box=(x1, y1, x2, y2),
+                    box=box,
                 ))
-        
-        if self.frame_output:
-            if self.config.annotate:
-                padding = self.config.annotations.padding
-                half_padding = padding // 2
-                for license_plate in res:
-                    x1, y1, x2, y2 = license_plate.box
-                    cv2.rectangle(input.frame, (x1, y1), (x2, y2), self.config.annotations.known_box_color if license_plate.known else self.config.annotations.unknown_box_color, self.config.annotations.box_thickness)
-                    if label:
-                        (text_width, text_height) = cv2.getTextSize(license_plate.label, self.config.annotations.font, self.config.annotations.text_scale, self.config.annotations.text_thickness)[0]
-                        cv2.rectangle(input.frame, (x1, y1 - padding - text_height), (x1 + padding + text_width, y1), (255, 255, 255), cv2.FILLED)
-                        cv2.putText(input.frame, license_plate.label, (x1 + half_padding, y1 - half_padding), self.config.annotations.font, self.config.annotations.text_scale, (0, 0, 0), self.config.annotations.text_thickness)
-
-            flag, enc = cv2.imencode('.jpg', input.frame)
-            if flag:
-                self.frame_output(BytesOutput(
-                    data=enc.tobytes(),
+            return res
+        return finish
+
+    def recognize(self, frame: np.ndarray) -> list[LicensePlateResult]:
+        return self.start(frame)()
+
+    def recognize_batch(self, frames: list[np.ndarray]) -> list[list[LicensePlateResult]]:
+        # for offline work on independent frames: one detector call for all of them and one OCR pass over all their plates,
+        # without tracking or the motion gate
+        if self.database:
+            self.index = self.database.index
+        with self.metrics.span("detect"):
+            detections: list[list[Detection]] = self.detect_batch(frames)
+        with self.metrics.span("crop"):
+            self.scratch, self.spare = self.spare, self.scratch
+            self.scratch.reset()
+            crops: list[np.ndarray] = [
+                crop_plate(frame, (int(x1), int(y1), int(x2), int(y2)), self.config.expand_x, self.config.expand_y, self.scratch)
+                for frame, license_detections in zip(frames, detections)
+                for x1, y1, x2, y2, _, _ in license_detections
+            ]
+        texts: list[tuple[str, float]] = self.read_plates(crops)()
+        results: list[list[LicensePlateResult]] = []
+        position: int = 0
+        for license_detections in detections:
+            res: list[LicensePlateResult] = []
+            for (x1, y1, x2, y2, score, _), (license_plate_text, license_plate_text_score) in zip(license_detections, texts[position:position + len(license_detections)]):
+                label, known, similarity = self.match(license_plate_text)
+                res.append(LicensePlateResult(
+                    label=label,
+                    license_plate=license_plate_text,
+                    known=known,
+                    detection_score=score,
+                    ocr_score=license_plate_text_score,
+                    similarity_score=similarity,
+                    box=(int(x1), int(y1), int(x2), int(y2)),
                 ))
+            position += len(license_detections)
+            results.append(res)
+        return results
+
+    def text_size(self, label: str) -> tuple[int, int]:
+        # names recur frame after frame; misread plates do not, so the cache is capped rather than kept forever
+        size: tuple[int, int] | None = self.text_sizes.get(label)
+        if size is None:
+            if len(self.text_sizes) >= 4096:
+                self.text_sizes.clear()
+            size = self.text_sizes[label] = cv2.getTextSize(label, self.config.annotations.font, self.config.annotations.text_scale, self.config.annotations.text_thickness)[0]
+        return size
+
+    def annotate(self, frame: np.ndarray, res: list[LicensePlateResult], scale_x: float = 1.0, scale_y: float = 1.0) -> None:
+        padding = self.config.annotations.padding
+        half_padding = padding // 2
+        for license_plate in res:
+            x1, y1, x2, y2 = license_plate.box
+            x1, y1, x2, y2 = int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), self.config.annotations.known_box_color if license_plate.known else self.config.annotations.unknown_box_color, self.config.annotations.box_thickness)
+            if license_plate.label:
+                (text_width, text_height) = self.text_size(license_plate.label)
+                cv2.rectangle(frame, (x1, y1 - padding - text_height), (x1 + padding + text_width, y1), (255, 255, 255), cv2.FILLED)
+                cv2.putText(frame, license_plate.label, (x1 + half_padding, y1 - half_padding), self.config.annotations.font, self.config.annotations.text_scale, (0, 0, 0), self.config.annotations.text_thickness)
+
+    def preview_size(self, shape: tuple[int, ...]) -> tuple[int, int] | None:
+        # (width, height) of a downscaled preview, None for the full frame
+        width, height = self.config.annotations.width, self.config.annotations.height
+        if not width and not height:
+            return None
+        if not width:
+            width = round(shape[1] * height / shape[0])
+        elif not height:
+            height = round(shape[0] * width / shape[1])
+        if width >= shape[1] and height >= shape[0]:
+            return None
+        return max(1, width), max(1, height)
+
+    def preview_due(self, now: float) -> bool:
+        return self.config.annotations.max_fps <= 0 or now >= self.next_preview
+
+    def wants_preview(self, res: list[LicensePlateResult]) -> bool:
+        now: float = time.monotonic()
+        if not self.preview_due(now):
+            return False
+        if self.config.annotations.only_changed:
+            # compared with the last preview sent, so a change during a rate-limited stretch still goes out
+            previewed: tuple[tuple[str, bool], ...] = tuple(sorted((license_plate.label, license_plate.known) for license_plate in res))
+            if previewed == self.previewed:
+                return False
+            self.previewed = previewed
+        if self.config.annotations.max_fps > 0:
+            interval: float = 1 / self.config.annotations.max_fps
+            # keeps the cadence through jitter without bursting after a pause
+            self.next_preview = max(self.next_preview, now - interval) + interval
+        return True
+
+    def downscale(self, frame: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+        with self.metrics.span("resize"):
+            return cv2.resize(frame, size, dst=self.previews.take((size[1], size[0], *frame.shape[2:]), frame.dtype), interpolation=cv2.INTER_AREA)
+
+    def own_frame(self, frame: np.ndarray) -> np.ndarray:
+        # a pooled copy at preview size, taken before the source can hand its buffer to the next frame
+        size: tuple[int, int] | None = self.preview_size(frame.shape)
+        return self.frames.copy(frame) if size is None else self.downscale(frame, size)
+
+    def encode_frame(self, frame: np.ndarray, res: list[LicensePlateResult], owned: bool = False, shape: tuple[int, ...] | None = None) -> BytesOutput | None:
+        # the source frame is never drawn on, annotations go to a pooled copy or the downscaled preview unless the frame already is one;
+        # boxes are in the coordinates of the source, whose shape is given when the frame already is a downscaled copy
+        shape = shape or frame.shape
+        canvas: np.ndarray = frame
+        size: tuple[int, int] | None = self.preview_size(frame.shape)
+        if size is not None:
+            canvas = self.downscale(frame, size)
+        elif self.config.annotate and res and not owned:
+            canvas = self.frames.copy(frame)
+        if self.config.annotate and res:
+            with self.metrics.span("annotate"):
+                self.annotate(canvas, res, canvas.shape[1] / shape[1], canvas.shape[0] / shape[0])
+        with self.metrics.span("encode"):
+            flag, enc = cv2.imencode('.jpg', canvas, self.jpeg_parameters)
+        if canvas is not frame:
+            (self.frames if size is None else self.previews).release(canvas)
+        if owned:
+            (self.frames if frame.shape == shape else self.previews).release(frame)
+        if flag:
+            return BytesOutput(
+                data=enc.tobytes(),
+            )
+        return None
+
+    def encode_results(self, timestamp: datetime, res: list[LicensePlateResult]) -> BytesOutput:
+        with self.metrics.span("serialize"):
+            return BytesOutput(
+                data=(json.dumps({str(timestamp): [license_plate._asdict() for license_plate in res]}) + "\n").encode("latin-1"),
+            )
+
+    def encode_metrics(self, snapshot: dict[str, Any]) -> BytesOutput:
+        text: str = to_prometheus(snapshot) if self.config.metrics_format == "prometheus" else to_json(snapshot)
+        return BytesOutput(
+            data=text.encode("utf-8"),
+        )
+
+    def encode_attendance(self, now: datetime, names: list[str]) -> BytesOutput:
+        # self.attendance_output("".join(f"{now},{name}\n" for name in names).encode("latin-1"))
+        return BytesOutput(
+            data="".join(["{\"", str(now), "\": ",  str(names).replace("'", '"'), "}\n"]).encode("latin-1"),
+        )
+
+    def attend(self, res: list[LicensePlateResult], now: datetime) -> list[str]:
+        names: list[str] = []
+        self.latest.expire(now)
+        for license_plate in res:
+            if license_plate.known:
+                name: str = license_plate.label
+                track: Track | None = self.tracker.tracks.get(license_plate.track_id) if self.tracker else None
+                # a track already attended under this name needs no wall-clock lookup
+                if (track is None or track.attended != name) and name not in self.latest:
+                    names.append(name)
+                if track is not None:
+                    track.attended = name
+                self.latest.touch(name, now)
+        return names
+
+    def send(self, name: str, sink: Function, job: Callable[[], BytesOutput | None], droppable: bool = False) -> None:
+        if self.async_output:
+            # only the hand-off is on this thread, it blocks once a never-dropped backlog is full
+            with self.metrics.span("sink"):
+                self.async_output.put(name, sink, job, droppable)
+            return
+        data: BytesOutput | None = job()
+        if data is not None:
+            with self.metrics.span("sink"):
+                sink(data)
+
+    def complete(self, frame: np.ndarray | None, finish: Callable[[], list[LicensePlateResult]] | None, owned: bool = False) -> None:
+        if finish is not None:
+            res: list[LicensePlateResult] = finish()
+            self.previous = res
+        else:
+            res: list[LicensePlateResult] = self.previous if self.config.motion_gate.reuse_results else []
+        self.emit(frame, res, owned)
+
+    def emit(self, frame: np.ndarray | None, res: list[LicensePlateResult], owned: bool = False) -> None:
+        if self.frame_output and frame is not None:
+            if self.preview and self.wants_preview(res):
+                shape: tuple[int, ...] = frame.shape
+                if self.async_output and not owned:
+                    # the job runs after this call returns, when the source may already reuse the frame's buffer
+                    frame, owned = self.own_frame(frame), True
+                self.send("frame", self.frame_output, lambda: self.encode_frame(frame, res, owned, shape), droppable=True)
+            else:
+                self.metrics.count("skipped_previews")
+                if owned:
+                    self.frames.release(frame)
 
         if res:
             if self.results_output:
-                self.results_output(BytesOutput(
-                    data=(json.dumps({str(datetime.now()): [license_plate._asdict() for license_plate in res]}) + "\n").encode("latin-1"),
-                ))
+                timestamp: datetime = datetime.now()
+                if self.results_writer:
+                    with self.metrics.span("serialize"):
+                        self.results_writer.add({str(timestamp): [license_plate._asdict() for license_plate in res]})
+                else:
+                    self.send("results", self.results_output, lambda: self.encode_results(timestamp, res))
 
             if not self.no_data and self.attendance_output:
-                names: list[str] = []
                 now: datetime = datetime.now()
-                for license_plate in res:
-                    if license_plate.known:
-                        name: str = license_plate.label
-                        if (name not in self.latest) or (now - self.latest[name] > timedelta(seconds=self.config.attendance_interval)):
-                            names.append(name)
-                        self.latest[name] = now
-
+                names: list[str] = self.attend(res, now)
                 if names:
-                    # self.attendance_output("".join(f"{now},{name}\n" for name in names).encode("latin-1"))
-                    self.attendance_output(BytesOutput(
-                        data="".join(["{\"", str(now), "\": ",  str(names).replace("'", '"'), "}\n"]).encode("latin-1"),
-                    ))
+                    self.metrics.count("attendance", len(names))
+                    if self.attendance_writer:
+                        self.attendance_writer.add({str(now): names})
+                    else:
+                        self.send("attendance", self.attendance_output, lambda: self.encode_attendance(now, names))
+
+    def __call__(self, input: LicensePlateRecognitionInput) -> IO:
+        with self.lock:
+            return self.process(input)
+
+    def process(self, input: LicensePlateRecognitionInput) -> IO:
+        started: float = time.perf_counter()
+        with self.metrics.span("frame"):
+            self.metrics.count("frames")
+            finish: Callable[[], list[LicensePlateResult]] | None = None
+            if self.motion_gate is None or self.motion_gate(input.frame):
+                finish = self.start(input.frame)
+            else:
+                self.metrics.count("skipped_frames")
+
+            if self.ocr_pool and self.config.ocr_pipeline:
+                # workers read this frame while the previous one is finished and sent, outputs lag one frame;
+                # the preview keeps a pooled copy as the source may reuse its buffer in the meantime
+                previous, self.pending = self.pending, (self.frames.copy(input.frame) if self.frame_output and self.preview and self.preview_due(time.monotonic()) else None, finish)
+                if previous is not None:
+                    self.complete(*previous, owned=True)
+            else:
+                self.complete(input.frame, finish)
+
+        if self.quality:
+            level: QualityLevel | None = self.quality.observe(time.perf_counter() - started)
+            if level is not None:
+                self.apply(level)
+
+        if self.metrics_output and self.metrics.due():
+            self.metrics.gauge("dropped_frames", self.async_output.dropped if self.async_output else 0)
+            snapshot: dict[str, Any] = self.metrics.snapshot()
+            self.send("metrics", self.metrics_output, lambda: self.encode_metrics(snapshot))
         return IO()
+
+    def close(self, timeout: float | None = None) -> None:
+        with self.lock:
+            # the last pipelined frame is finished and sent while the writers and async outputs are still open
+            pending, self.pending = self.pending, None
+            if pending is not None:
+                try:
+                    self.complete(*pending, owned=True)
+                except Exception:
+                    logger.exception("Finishing the last license plate frame failed")
+            if self.ocr_pool:
+                self.ocr_pool.release(timeout)
+            if self.database:
+                self.database.release()
+                self.database = None
+        unregister(self)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+import numpy as np
+import cv2
+import easyocr
+import psutil
+import torch
+from ultralytics import YOLO
+from packages.license_plate_recognition.algorithm.runtime import DETECTOR, load_onnx_reader, model_file
+from typing import Any, Callable, ClassVar, NamedTuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from packages.license_plate_recognition.algorithm.config import LicensePlateRecognitionConfig
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+class ModelStats(NamedTuple):
+    load_time: float
+    warmup_time: float
+    memory: int
+    device_memory: int
+
+class SharedDetector:
+    # ultralytics predictors keep per-call state, so concurrent callers of one shared model take turns
+    def __init__(self, model: Any) -> None:
+        self.model: Any = model
+        self.lock: threading.Lock = threading.Lock()
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        with self.lock:
+            return self.model(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+class ModelEntry:
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.instance: Any = None
+        self.stats: ModelStats | None = None
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def warmup_frame(height: int, width: int) -> np.ndarray:
+    frame: np.ndarray = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.putText(frame, "AB123CD", (width // 10, height * 2 // 3), cv2.FONT_HERSHEY_SIMPLEX, height / 40, (0, 0, 0), max(1, height // 20))
+    return frame
+
+def model_variant(config: LicensePlateRecognitionConfig) -> str:
+    if config.backend == "onnxruntime":
+        return "onnx-int8" if config.quantized else "onnx"
+    return "torch"
+
+def load_detector(path_to_models: str, device: str, variant: str) -> SharedDetector:
+    # ultralytics runs exported .onnx detectors through ONNX Runtime itself and returns the same Results
+    license_plate_detector: YOLO = YOLO(model_file(path_to_models, DETECTOR, variant), task="detect")
+    if variant == "torch":
+        license_plate_detector.to(device)
+    return SharedDetector(license_plate_detector)
+
+def load_reader(path_to_models: str, device: str, variant: str) -> easyocr.Reader:
+    if variant != "torch":
+        return load_onnx_reader(path_to_models, device, variant)
+    return easyocr.Reader(['en'], model_storage_directory=path_to_models, gpu=device != "cpu")
+
+def warm_detector(detector: Any, runs: int) -> None:
+    for _ in range(runs):
+        detector(warmup_frame(640, 640), verbose=False)
+
+def warm_reader(reader: Any, runs: int) -> None:
+    crop: np.ndarray = cv2.cvtColor(warmup_frame(64, 256), cv2.COLOR_BGR2GRAY)
+    for _ in range(runs):
+        reader.readtext(crop)
+
+class ModelRegistry:
+    _entries: ClassVar[dict[tuple[str, str, str, str], ModelEntry]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    # loads run one at a time so the RSS delta of each can be attributed to it
+    _loading: ClassVar[threading.Lock] = threading.Lock()
+    loaders: ClassVar[dict[str, tuple[Callable[[str, str, str], Any], Callable[[Any, int], None]]]] = {
+        "detector": (load_detector, warm_detector),
+        "reader": (load_reader, warm_reader),
+    }
+
+    @classmethod
+    def entry(cls, kind: str, path_to_models: str, device: str, variant: str = "torch") -> ModelEntry:
+        with cls._lock:
+            return cls._entries.setdefault((kind, path_to_models, device, variant), ModelEntry())
+
+    @classmethod
+    def get(cls, kind: str, path_to_models: str, device: str = "", warmup: int = 0, variant: str = "torch") -> Any:
+        device = device or default_device()
+        entry: ModelEntry = cls.entry(kind, path_to_models, device, variant)
+        # the per-model lock makes a second caller wait for a load already in flight instead of loading again
+        with entry.lock:
+            if entry.instance is None:
+                with cls._loading:
+                    cls.load(entry, kind, path_to_models, device, warmup, variant)
+            return entry.instance
+
+    @classmethod
+    def load(cls, entry: ModelEntry, kind: str, path_to_models: str, device: str, warmup: int, variant: str = "torch") -> None:
+        loader, warmer = cls.loaders[kind]
+        process: psutil.Process = psutil.Process()
+        memory: int = process.memory_info().rss
+        device_memory: int = torch.cuda.memory_allocated() if device.startswith("cuda") else 0
+        start: float = time.perf_counter()
+        instance: Any = loader(path_to_models, device, variant)
+        loaded: float = time.perf_counter()
+        warmer(instance, warmup)
+        entry.stats = ModelStats(
+            load_time=loaded - start,
+            warmup_time=time.perf_counter() - loaded,
+            memory=process.memory_info().rss - memory,
+            device_memory=(torch.cuda.memory_allocated() - device_memory) if device.startswith("cuda") else 0,
+        )
+        entry.instance = instance
+        logger.info("Loaded %s (%s) from %s on %s in %.2fs (warm-up %.2fs, +%d MiB RSS, +%d MiB device)", kind, variant, path_to_models, device, entry.stats.load_time, entry.stats.warmup_time, entry.stats.memory >> 20, entry.stats.device_memory >> 20)
+
+    @classmethod
+    def put(cls, kind: str, path_to_models: str, instance: Any, device: str = "", variant: str = "torch") -> None:
+        entry: ModelEntry = cls.entry(kind, path_to_models, device or default_device(), variant)
+        with entry.lock:
+            entry.instance = instance
+            entry.stats = ModelStats(0.0, 0.0, 0, 0)
+
+    @classmethod
+    def detector(cls, config: LicensePlateRecognitionConfig) -> Any:
+        return cls.get("detector", config.path_to_models, warmup=config.model_warmup, variant=model_variant(config))
+
+    @classmethod
+    def reader(cls, config: LicensePlateRecognitionConfig) -> Any:
+        return cls.get("reader", config.path_to_models, warmup=config.model_warmup, variant=model_variant(config))
+
+    @classmethod
+    def preload(cls, config: LicensePlateRecognitionConfig) -> list[threading.Thread]:
+        threads: list[threading.Thread] = []
+        # OCR worker processes load their own readers
+        for load in (cls.detector, cls.reader) if config.ocr_workers <= 0 else (cls.detector,):
+            thread: threading.Thread = threading.Thread(target=load, args=(config,), name="license-plate-model-preload", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    @classmethod
+    def stats(cls) -> dict[str, ModelStats]:
+        with cls._lock:
+            return {f"{kind}:{path}:{device}:{variant}": entry.stats for (kind, path, device, variant), entry in cls._entries.items() if entry.stats is not None}
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+import numpy as np
+import cv2
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from packages.license_plate_recognition.algorithm.config import MotionGateConfig
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+class MotionGate:
+    def __init__(self, config: MotionGateConfig) -> None:
+        self.config: MotionGateConfig = config
+        self.reference: np.ndarray | None = None
+        self.subtractor: cv2.BackgroundSubtractor | None = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if config.method == "mog2" else None
+        self.frames: int = 0
+        self.skipped: int = 0
+        self.since_detection: int = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def downscale(self, frame: np.ndarray) -> np.ndarray:
+        if self.config.region:
+            x1, y1, x2, y2 = self.config.region
+            frame = frame[max(0, y1):y2, max(0, x1):x2]
+        small: np.ndarray = cv2.resize(frame, None, fx=self.config.downscale, fy=self.config.downscale, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+    def changed(self, small: np.ndarray) -> float:
+        if self.subtractor is not None:
+            return np.count_nonzero(self.subtractor.apply(small)) / small.size
+        if self.reference is None or self.reference.shape != small.shape:
+            return 1.0
+        return np.count_nonzero(cv2.absdiff(small, self.reference) > self.config.pixel_threshold) / small.size
+
+    def __call__(self, frame: np.ndarray) -> bool:
+        self.frames += 1
+        small: np.ndarray = self.downscale(frame)
+        # difference against the frame of the last detection so slow approaches still add up
+        detect: bool = self.changed(small) >= self.config.min_changed or self.since_detection + 1 >= self.config.force_every
+        if detect:
+            self.reference = small
+            self.since_detection = 0
+        else:
+            self.skipped += 1
+            self.since_detection += 1
+        if self.config.report_every and self.frames % self.config.report_every == 0:
+            logger.info("Motion gate skipped %d of %d frames (%.1f%%)", self.skipped, self.frames, 100 * self.skip_ratio)
+        return detect
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import numpy as np
+import cv2
+from typing import Any, TYPE_CHECKING
+if TYPE_CHECKING:
+    import easyocr
+    from packages.license_plate_recognition.algorithm.buffers import CropScratch
+    from packages.license_plate_recognition.algorithm.config import EasyOCRConfig
+
+DETECT_PARAMETERS: tuple[str, ...] = ("text_threshold", "low_text", "link_threshold")
+# (height, width) of the largest canvas the detector sees, plates are far smaller unless the camera is very close
+MAX_CANVAS: tuple[int, int] = (320, 1280)
+
+Detection = tuple[list[list[float]], str, float]
+
+def clamp_box(box: tuple[int, int, int, int], expand_x: int, expand_y: int, width: int, height: int) -> tuple[int, int, int, int]:
+    # negative coordinates would wrap around as slice indices, keep at least one pixel inside the frame
+    x1, y1, x2, y2 = box
+    x1 = min(max(0, x1 - expand_x), width - 1)
+    y1 = min(max(0, y1 - expand_y), height - 1)
+    return x1, y1, max(x1 + 1, min(width, x2 + expand_x)), max(y1 + 1, min(height, y2 + expand_y))
+
+def crop_plate(frame: np.ndarray, box: tuple[int, int, int, int], expand_x: int, expand_y: int, scratch: CropScratch | None = None) -> np.ndarray:
+    x1, y1, x2, y2 = clamp_box(box, expand_x, expand_y, frame.shape[1], frame.shape[0])
+    if scratch is None:
+        return cv2.cvtColor(frame[y1:y2, x1:x2, :], cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(frame[y1:y2, x1:x2, :], cv2.COLOR_BGR2GRAY, dst=scratch.take(y2 - y1, x2 - x1))
+
+def letterbox(crops: list[np.ndarray]) -> tuple[np.ndarray, list[tuple[float, float]]]:
+    # pad every crop into a common top-left anchored canvas, only crops larger than the capped canvas are scaled down
+    height: int = min(MAX_CANVAS[0], max(crop.shape[0] for crop in crops))
+    width: int = min(MAX_CANVAS[1], max(crop.shape[1] for crop in crops))
+    batch: np.ndarray = np.zeros((len(crops), height, width), dtype=np.uint8)
+    scales: list[tuple[float, float]] = []
+    for count, crop in enumerate(crops):
+        scale: float = min(1.0, width / crop.shape[1], height / crop.shape[0])
+        h: int = min(height, max(1, round(crop.shape[0] * scale)))
+        w: int = min(width, max(1, round(crop.shape[1] * scale)))
+        batch[count, :h, :w] = crop if (h, w) == crop.shape else cv2.resize(crop, (w, h), interpolation=cv2.INTER_AREA)
+        scales.append((w / crop.shape[1], h / crop.shape[0]))
+    return batch, scales
+
+def stack_boxes(horizontal_lists: list[list[list[int]]], free_lists: list[list[list[list[float]]]], height: int) -> tuple[list[list[int]], list[list[list[float]]]]:
+    # move the boxes of every canvas onto its band of the stacked canvases, clipped to the band like easyocr clips them to the image
+    horizontal: list[list[int]] = []
+    free: list[list[list[float]]] = []
+    for count, (horizontal_list, free_list) in enumerate(zip(horizontal_lists, free_lists)):
+        offset: int = count * height
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            horizontal.append([x_min, x_max, offset + min(max(0, y_min), height), offset + min(max(0, y_max), height)])
+        for box in free_list:
+            free.append([[x, offset + min(max(0.0, y), height)] for x, y in box])
+    return horizontal, free
+
+def split_parameters(ocr_config: EasyOCRConfig) -> tuple[dict[str, Any], dict[str, Any]]:
+    parameters: dict[str, Any] = ocr_config._asdict()
+    detect_parameters: dict[str, Any] = {key: parameters.pop(key) for key in DETECT_PARAMETERS}
+    return detect_parameters, parameters
+
+def read_batch(reader: easyocr.Reader, crops: list[np.ndarray], ocr_config: EasyOCRConfig) -> list[list[Detection]]:
+    detect_parameters, recognize_parameters = split_parameters(ocr_config)
+    batch_size: int = max(1, ocr_config.batch_size)
+    results: list[list[Detection]] = []
+    for start in range(0, len(crops), batch_size):
+        batch, scales = letterbox(crops[start:start + batch_size])
+        horizontal_lists, free_lists = reader.detect(
+            np.stack([cv2.cvtColor(grey, cv2.COLOR_GRAY2BGR) for grey in batch]),
+            reformat=False,
+            **detect_parameters,
+        )
+        results.extend([] for _ in scales)
+        horizontal, free = stack_boxes(horizontal_lists, free_lists, batch.shape[1])
+        if not horizontal and not free:
+            continue
+        # easyocr recognizes one image per call, so the canvases are read as one tall image holding all of their boxes
+        for box, text, score in reader.recognize(batch.reshape(-1, batch.shape[2]), horizontal, free, reformat=False, **recognize_parameters):
+            count: int = min(len(scales) - 1, int(sum(y for _, y in box) / len(box) // batch.shape[1]))
+            offset: int = count * batch.shape[1]
+            scale_x, scale_y = scales[count]
+            # map the boxes back onto the original crop so the filters below see the same geometry as before
+            results[start + count].append(([[x / scale_x, (y - offset) / scale_y] for x, y in box], text, score))
+    return results
+
+def assemble_text(detections: list[Detection], shape: tuple[int, ...], sorting_tolerance: float, min_text_percentage: float) -> tuple[str, float]:
+    ocr_scores: float = 0.0
+    plate: list[str] = []
+    if detections:
+        box_size: int = shape[0]*shape[1]
+        sorted_detections = sorted( detections, key=lambda result:(int(result[0][0][1]/shape[1]/sorting_tolerance), result[0][0][0]) )
+
+        for (box, text, det_score) in sorted_detections:
+            if np.sum(np.subtract(box[1], box[0]))*np.sum(np.subtract(box[2], box[1])) / box_size > min_text_percentage:
+                ocr_scores += det_score
+                plate.append(text.upper())
+    if len(plate) != 0 :
+        return "".join(plate), ocr_scores/len(plate)
+    return "", 0.0
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import itertools
+import logging
+import math
+import multiprocessing
+import queue
+import threading
+import numpy as np
+import cv2
+import torch
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from packages.license_plate_recognition.algorithm.models import load_reader, model_variant
+from packages.license_plate_recognition.algorithm.ocr import assemble_text, read_batch
+from typing import Any, ClassVar, TYPE_CHECKING
+if TYPE_CHECKING:
+    from packages.license_plate_recognition.algorithm.config import EasyOCRConfig, LicensePlateRecognitionConfig
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# task id, slot index, height, width of a crop waiting in shared memory, then the decoder and beam width to read it with
+Task = tuple[int, int, int, int, str, int]
+
+def work(memory_name: str, slot_size: int, tasks: Any, results: Any, path_to_models: str, variant: str, threads: int, ocr_config: EasyOCRConfig, sorting_tolerance: float, min_text_percentage: float) -> None:
+    # every worker is single purpose: its own reader, its own few threads, crops read straight out of shared memory
+    torch.set_num_threads(max(1, threads))
+    cv2.setNumThreads(1)
+    memory: shared_memory.SharedMemory = shared_memory.SharedMemory(name=memory_name)
+    reader: Any = load_reader(path_to_models, "cpu", variant)
+    stopping: bool = False
+    while not stopping:
+        batch: list[Task | None] = [tasks.get()]
+        # one sentinel is sent per worker, a worker that took one must leave the others theirs
+        while batch[-1] is not None and len(batch) < max(1, ocr_config.batch_size):
+            try:
+                batch.append(tasks.get_nowait())
+            except queue.Empty:
+                break
+        stopping = batch[-1] is None
+        pending: list[Task] = [task for task in batch if task is not None]
+        if not pending:
+            continue
+        # streams under adaptive quality may ask for different decoding, each setting is read as its own batch
+        groups: dict[tuple[str, int], list[Task]] = {}
+        for task in pending:
+            groups.setdefault((task[4], task[5]), []).append(task)
+        for (decoder, beam_width), group in groups.items():
+            # the parent keeps a slot reserved until its result arrives, so the views stay valid without copying
+            crops: list[np.ndarray] = [np.ndarray((height, width), dtype=np.uint8, buffer=memory.buf, offset=slot * slot_size) for _, slot, height, width, _, _ in group]
+            try:
+                texts: list[tuple[str, float]] = [
+                    assemble_text(detections, crop.shape, sorting_tolerance, min_text_percentage)
+                    for crop, detections in zip(crops, read_batch(reader, crops, ocr_config._replace(decoder=decoder or ocr_config.decoder, beamWidth=beam_width or ocr_config.beamWidth)))
+                ]
+                for task, (text, score) in zip(group, texts):
+                    results.put((task[0], text, score, ""))
+            except Exception as e:
+                for task in group:
+                    results.put((task[0], "", 0.0, repr(e)))
+            del crops
+    memory.close()
+
+class OCRPool:
+    _pools: ClassVar[dict[tuple[Any, ...], OCRPool]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get(cls, config: LicensePlateRecognitionConfig) -> OCRPool:
+        # one pool per model and reading setup, shared by every stream of the process like the detection scheduler
+        key: tuple[Any, ...] = (
+            config.path_to_models,
+            model_variant(config),
+            config.ocr_workers,
+            config.ocr_worker_threads,
+            config.ocr_slots,
+            config.ocr_slot_size,
+            config.ocr_config,
+            config.sorting_tolerance,
+            config.min_text_percentage,
+        )
+        with cls._lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(*key)
+            # every stream releases its pool when it stops, the last one shuts the workers down
+            cls._pools[key].users += 1
+            return cls._pools[key]
+
+    def __init__(self, path_to_models: str, variant: str, workers: int, threads: int, slots: int, slot_size: int, ocr_config: EasyOCRConfig, sorting_tolerance: float, min_text_percentage: float) -> None:
+        context: multiprocessing.context.SpawnContext = multiprocessing.get_context("spawn")
+        self.key: tuple[Any, ...] = (path_to_models, variant, workers, threads, slots, slot_size, ocr_config, sorting_tolerance, min_text_percentage)
+        self.users: int = 0
+        self.error: BaseException | None = None
+        self.closing: bool = False
+        self.slot_size: int = slot_size
+        self.memory: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=max(1, slots) * slot_size)
+        self.free: queue.Queue[int] = queue.Queue()
+        for slot in range(max(1, slots)):
+            self.free.put(slot)
+        self.tasks: Any = context.Queue()
+        self.results: Any = context.Queue()
+        self.futures: dict[int, tuple[Future, int]] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.ids: itertools.count = itertools.count()
+        self.processes: list[multiprocessing.process.BaseProcess] = [
+            context.Process(
+                target=work,
+                args=(self.memory.name, slot_size, self.tasks, self.results, path_to_models, variant, threads, ocr_config, sorting_tolerance, min_text_percentage),
+                name=f"license-plate-ocr-{count}",
+                daemon=True,
+            )
+            for count in range(max(1, workers))
+        ]
+        for process in self.processes:
+            process.start()
+        self.collector: threading.Thread = threading.Thread(target=self.collect, name="license-plate-ocr-results", daemon=True)
+        self.collector.start()
+
+    def fit(self, crop: np.ndarray) -> np.ndarray:
+        # the assembled text only depends on relative geometry, so oversized crops can shrink into a slot
+        if crop.size <= self.slot_size:
+            return crop
+        scale: float = math.sqrt(self.slot_size / crop.size)
+        return cv2.resize(crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+
+    def acquire(self) -> int:
+        # waits for a free slot, but not on workers that are gone
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                return self.free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def submit(self, crop: np.ndarray, decoder: str = "", beam_width: int = 0) -> Future:
+        crop = self.fit(crop)
+        slot: int = self.acquire()
+        np.ndarray(crop.shape, dtype=np.uint8, buffer=self.memory.buf, offset=slot * self.slot_size)[:] = crop
+        future: Future = Future()
+        task_id: int = next(self.ids)
+        with self.lock:
+            if self.error is not None:
+                raise self.error
+            self.futures[task_id] = (future, slot)
+        self.tasks.put((task_id, slot, crop.shape[0], crop.shape[1], decoder, beam_width))
+        return future
+
+    def collect(self) -> None:
+        while True:
+            try:
+                result: tuple[int, str, float, str] | None = self.results.get(timeout=1.0)
+            except queue.Empty:
+                dead: list[multiprocessing.process.BaseProcess] = [process for process in self.processes if not process.is_alive()]
+                if dead and not self.closing:
+                    self.fail(RuntimeError(f"OCR worker {dead[0].name} exited with code {dead[0].exitcode}"))
+                    return
+                continue
+            if result is None:
+                return
+            task_id, text, score, error = result
+            with self.lock:
+                entry: tuple[Future, int] | None = self.futures.pop(task_id, None)
+            if entry is None:
+                continue
+            future, slot = entry
+            self.free.put(slot)
+            if error:
+                future.set_exception(RuntimeError(f"OCR worker failed: {error}"))
+            else:
+                future.set_result((text, score))
+
+    def fail(self, error: BaseException) -> None:
+        # the tasks of a dead worker are lost and the survivors may still write into their slots,
+        # so the whole pool goes and the next stream to start gets a fresh one
+        logger.error("OCR pool failed: %s", error)
+        self.abandon(error)
+        with OCRPool._lock:
+            if OCRPool._pools.get(self.key) is self:
+                del OCRPool._pools[self.key]
+        for process in self.processes:
+            process.terminate()
+        self.unlink()
+
+    def abandon(self, error: BaseException) -> None:
+        # reads still waiting raise instead of blocking their stream forever
+        with self.lock:
+            self.error = error
+            futures: list[tuple[Future, int]] = list(self.futures.values())
+            self.futures.clear()
+        for future, _ in futures:
+            future.set_exception(error)
+
+    def release(self, timeout: float | None = None) -> None:
+        with OCRPool._lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if OCRPool._pools.get(self.key) is self:
+                del OCRPool._pools[self.key]
+        self.close(timeout)
+
+    def unlink(self) -> None:
+        try:
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self, timeout: float | None = None) -> None:
+        self.closing = True
+        for process in self.processes:
+            if process.is_alive():
+                self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.results.put(None)
+        self.collector.join(timeout)
+        if self.error is None:
+            self.abandon(RuntimeError("OCR pool closed"))
+        self.memory.close()
+        self.unlink()
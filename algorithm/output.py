@@ -0,0 +1,95 @@
+from __future__ import annotations
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+Job = Callable[[], Optional[Any]]
+
+class SinkWorker:
+    def __init__(self, name: str, sink: Callable[[Any], Any], maxsize: int, drop_oldest: bool) -> None:
+        self.name: str = name
+        self.sink: Callable[[Any], Any] = sink
+        self.maxsize: int = maxsize
+        self.drop_oldest: bool = drop_oldest
+        self.jobs: deque[Job | None] = deque()
+        self.condition: threading.Condition = threading.Condition()
+        self.dropped: int = 0
+        self.thread: threading.Thread = threading.Thread(target=self.run, name=f"license-plate-{name}-output", daemon=True)
+        self.thread.start()
+
+    def put(self, job: Job | None) -> None:
+        with self.condition:
+            if job is not None and self.maxsize > 0 and len(self.jobs) >= self.maxsize:
+                if self.drop_oldest:
+                    self.jobs.popleft()
+                    self.dropped += 1
+                else:
+                    self.condition.wait_for(lambda: len(self.jobs) < self.maxsize)
+            self.jobs.append(job)
+            self.condition.notify_all()
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self.jobs) > 0)
+                job: Job | None = self.jobs.popleft()
+                self.condition.notify_all()
+            if job is None:
+                return
+            try:
+                data: Any = job()
+                if data is not None:
+                    self.sink(data)
+            except Exception:
+                logger.exception("License plate %s output failed", self.name)
+
+    def close(self, timeout: float | None = None) -> None:
+        self.put(None)
+        self.thread.join(timeout)
+
+class AsyncOutput:
+    def __init__(self, config: Any, preview_size: int, backlog: int) -> None:
+        self.config: Any = config
+        self.preview_size: int = preview_size
+        self.backlog: int = backlog
+        self.workers: dict[str, SinkWorker] = {}
+        register(self)
+
+    def put(self, name: str, sink: Callable[[Any], Any], job: Job, droppable: bool = False) -> None:
+        # one worker per sink keeps every sink in submission order; only previews may be dropped
+        if name not in self.workers:
+            self.workers[name] = SinkWorker(name, sink, self.preview_size if droppable else self.backlog, droppable)
+        self.workers[name].put(job)
+
+    @property
+    def dropped(self) -> int:
+        return sum(worker.dropped for worker in self.workers.values())
+
+    def close(self, timeout: float | None = None) -> None:
+        for worker in self.workers.values():
+            worker.close(timeout)
+        self.workers.clear()
+        unregister(self)
+
+# anything with a config and close(timeout) that has to be closed when its pipe stops
+_outputs: list[Any] = []
+_lock: threading.Lock = threading.Lock()
+
+def register(output: Any) -> None:
+    with _lock:
+        _outputs.append(output)
+
+def unregister(output: Any) -> None:
+    with _lock:
+        if output in _outputs:
+            _outputs.remove(output)
+
+def close_outputs(config: Any, timeout: float | None = None) -> None:
+    with _lock:
+        outputs: list[Any] = [output for output in _outputs if output.config is config]
+    # newest first, so buffered writers flush into the async outputs before those are drained and closed
+    for output in reversed(outputs):
+        output.close(timeout)
@@ -22,14 +22,19 @@ class LicensePlateRecognitionPipe(pipe.Pipe):
         if self.playing:
             return
         self.playing = True
+        if self.config.preload_models: license_plate_recognition.ModelRegistry.preload(self.config)
         if self.config.frame_output: self.config.frame_output.play(manager)
         if self.config.results_output: self.config.results_output.play(manager)
         if self.config.attendance_output: self.config.attendance_output.play(manager)
+        if self.config.metrics_output: self.config.metrics_output.play(manager)
 
     def stop(self, manager: Manager, result: pipe.IO) -> None:
         if not self.playing:
             return
         self.playing = False
+        # closes the functions (and their OCR pool references), flushes buffered records and drains the async outputs before the sinks stop
+        license_plate_recognition.close_outputs(self.config)
         if self.config.frame_output: self.config.frame_output.stop(manager, result)
         if self.config.results_output: self.config.results_output.stop(manager, result)
         if self.config.attendance_output: self.config.attendance_output.stop(manager, result)
+        if self.config.metrics_output: self.config.metrics_output.stop(manager, result)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import logging
+from collections import deque
+from typing import NamedTuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from packages.license_plate_recognition.algorithm.config import QualityConfig
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+class QualityLevel(NamedTuple):
+    # empty or zero keeps the configured value
+    decoder: str = ""
+    beam_width: int = 0
+    detector_imgsz: int = 0
+    preview: bool = True
+
+# highest quality first, every step gives up a little more
+DEFAULT_LADDER: tuple[QualityLevel, ...] = (
+    QualityLevel(),
+    QualityLevel("beamsearch", 4),
+    QualityLevel("greedy", 1),
+    QualityLevel("greedy", 1, 0, False),
+    QualityLevel("greedy", 1, 480, False),
+    QualityLevel("greedy", 1, 320, False),
+)
+
+def parse_ladder(text: str) -> tuple[QualityLevel, ...]:
+    # "decoder,beam width,detector size,preview; ..." - levels separated by semicolons
+    levels: list[QualityLevel] = []
+    for level in text.split(";"):
+        fields: list[str] = [field.strip() for field in level.split(",")]
+        if not any(fields):
+            continue
+        fields += [""] * (4 - len(fields))
+        levels.append(QualityLevel(fields[0], int(fields[1] or 0), int(fields[2] or 0), fields[3] != "0"))
+    return tuple(levels) if levels else DEFAULT_LADDER
+
+def format_ladder(levels: tuple[QualityLevel, ...]) -> str:
+    return "; ".join(f"{level.decoder},{level.beam_width},{level.detector_imgsz},{int(level.preview)}" for level in levels)
+
+class QualityController:
+    def __init__(self, config: QualityConfig) -> None:
+        self.config: QualityConfig = config
+        self.ladder: tuple[QualityLevel, ...] = config.ladder or DEFAULT_LADDER
+        self.level: int = 0
+        self.latencies: deque[float] = deque(maxlen=max(1, config.window))
+        self.switches: int = 0
+
+    @property
+    def current(self) -> QualityLevel:
+        return self.ladder[self.level]
+
+    def observe(self, latency: float) -> QualityLevel | None:
+        # returns the new level when the rolling latency (in seconds) calls for a switch
+        self.latencies.append(latency)
+        # every level is judged on a full window of its own frames
+        if len(self.latencies) < self.latencies.maxlen:
+            return None
+        mean: float = sum(self.latencies) / len(self.latencies)
+        target: float = self.config.target_latency / 1000
+        if mean > target and self.level + 1 < len(self.ladder):
+            step: int = 1
+        elif mean < target * self.config.recover and self.level > 0:
+            step: int = -1
+        else:
+            return None
+        self.level += step
+        self.latencies.clear()
+        self.switches += 1
+        logger.info(
+            "License plate quality %s to level %d of %d (%s) at %.1f ms mean latency, target %.1f ms",
+            "lowered" if step > 0 else "raised", self.level, len(self.ladder) - 1, format_ladder((self.current,)), mean * 1000, self.config.target_latency,
+        )
+        return self.current
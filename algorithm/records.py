@@ -0,0 +1,151 @@
+from __future__ import annotations
+import json
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from packages.license_plate_recognition.algorithm.output import register, unregister
+from typing import Any, Callable
+
+def pack(value: Any, out: bytearray) -> None:
+    # the msgpack subset our records need, readable by any msgpack decoder
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -0x20 <= value < 0:
+            out.append(value & 0xff)
+        elif value >= 0:
+            out += struct.pack(">BQ", 0xcf, value)
+        else:
+            out += struct.pack(">Bq", 0xd3, value)
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xcb, value)
+    elif isinstance(value, str):
+        data: bytes = value.encode("utf-8")
+        if len(data) < 0x20:
+            out.append(0xa0 | len(data))
+        elif len(data) < 0x100:
+            out += struct.pack(">BB", 0xd9, len(data))
+        elif len(data) < 0x10000:
+            out += struct.pack(">BH", 0xda, len(data))
+        else:
+            out += struct.pack(">BI", 0xdb, len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        if len(value) < 0x10:
+            out.append(0x90 | len(value))
+        elif len(value) < 0x10000:
+            out += struct.pack(">BH", 0xdc, len(value))
+        else:
+            out += struct.pack(">BI", 0xdd, len(value))
+        for item in value:
+            pack(item, out)
+    elif isinstance(value, dict):
+        if len(value) < 0x10:
+            out.append(0x80 | len(value))
+        elif len(value) < 0x10000:
+            out += struct.pack(">BH", 0xde, len(value))
+        else:
+            out += struct.pack(">BI", 0xdf, len(value))
+        for key, item in value.items():
+            pack(key, out)
+            pack(item, out)
+    else:
+        raise TypeError(f"Cannot pack {type(value).__name__}")
+
+def encode_json(record: dict[str, Any]) -> bytes:
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+def encode_binary(record: dict[str, Any]) -> bytes:
+    # every record is prefixed with its length (4 bytes, little endian) so a stream can be split without parsing
+    body: bytearray = bytearray()
+    pack(record, body)
+    return len(body).to_bytes(4, "little") + body
+
+ENCODERS: dict[str, Callable[[dict[str, Any]], bytes]] = {
+    "jsonl": encode_json,
+    "binary": encode_binary,
+}
+
+class RecordWriter:
+    # coalesces records into one sink call per `max_records` records, `max_bytes` bytes or `max_delay` seconds
+    def __init__(self, config: Any, write: Callable[[bytes], None], format: str, max_records: int, max_bytes: int, max_delay: float) -> None:
+        self.config: Any = config
+        self.write: Callable[[bytes], None] = write
+        self.encode: Callable[[dict[str, Any]], bytes] = ENCODERS.get(format, encode_json)
+        self.max_records: int = max(1, max_records)
+        self.max_bytes: int = max(1, max_bytes)
+        self.max_delay: float = max_delay
+        self.buffer: bytearray = bytearray()
+        self.records: int = 0
+        # armed by the first record of every batch, so a stream that goes quiet still hands its records over in time
+        self.timer: threading.Timer | None = None
+        self.batches: int = 0
+        # the timer and stop flush from other threads; writing is held across the sink call so batches reach it one at a
+        # time and in order, lock only guards the buffer so adding never waits for a sink
+        self.lock: threading.Lock = threading.Lock()
+        self.writing: threading.Lock = threading.Lock()
+        register(self)
+
+    def add(self, record: dict[str, Any]) -> None:
+        data: bytes = self.encode(record)
+        with self.lock:
+            if not self.records:
+                self.batches += 1
+                self.timer = threading.Timer(self.max_delay, self.flush, (self.batches,))
+                self.timer.daemon = True
+                self.timer.start()
+            self.buffer += data
+            self.records += 1
+            full: bool = self.records >= self.max_records or len(self.buffer) >= self.max_bytes
+        if full:
+            self.flush()
+
+    def flush(self, batch: int | None = None) -> None:
+        with self.writing:
+            with self.lock:
+                # a timer that fired while its batch was flushed for its size must not cut the next batch short
+                if batch is not None and batch != self.batches:
+                    return
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                if not self.records:
+                    return
+                data: bytes = bytes(self.buffer)
+                self.buffer.clear()
+                self.records = 0
+            self.write(data)
+
+    def close(self, timeout: float | None = None) -> None:
+        self.flush()
+        unregister(self)
+
+class Cooldown:
+    # names seen within the last `interval`, oldest first, so expired names fall off the front
+    def __init__(self, interval: timedelta) -> None:
+        self.interval: timedelta = interval
+        self.seen: OrderedDict[str, datetime] = OrderedDict()
+
+    def expire(self, now: datetime) -> None:
+        while self.seen:
+            name, seen = next(iter(self.seen.items()))
+            if now - seen <= self.interval:
+                break
+            self.seen.popitem(last=False)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.seen
+
+    def __len__(self) -> int:
+        return len(self.seen)
+
+    def touch(self, name: str, now: datetime) -> None:
+        self.seen[name] = now
+        self.seen.move_to_end(name)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import numpy as np
+import cv2
+from packages.license_plate_recognition.algorithm.tracker import iou
+from typing import Any
+
+Polygon = tuple[tuple[int, int], ...]
+
+# a detection row as ultralytics reports it: x1, y1, x2, y2, score, class
+Detection = list[float]
+
+class Region:
+    def __init__(self, polygon: Polygon) -> None:
+        self.polygon: np.ndarray = np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2)
+        x, y, width, height = cv2.boundingRect(self.polygon)
+        self.bounds: tuple[int, int, int, int] = (x, y, x + width, y + height)
+
+    def crop(self, frame: np.ndarray) -> tuple[np.ndarray, tuple[int, int]]:
+        # a view of the bounding rectangle, clamped to the frame; empty when the region lies outside of it
+        x1, y1, x2, y2 = self.bounds
+        x1, y1 = max(0, x1), max(0, y1)
+        return frame[y1:max(y1, min(frame.shape[0], y2)), x1:max(x1, min(frame.shape[1], x2))], (x1, y1)
+
+    def contains(self, x: float, y: float) -> bool:
+        return cv2.pointPolygonTest(self.polygon, (float(x), float(y)), False) >= 0
+
+def parse_regions(text: str) -> tuple[Polygon, ...]:
+    # "x,y x,y x,y; x,y x,y x,y" - polygons separated by semicolons, points by spaces
+    polygons: list[Polygon] = []
+    for polygon in text.split(";"):
+        points: list[tuple[int, int]] = [(int(x), int(y)) for x, y in (point.split(",") for point in polygon.split())]
+        if len(points) >= 3:
+            polygons.append(tuple(points))
+    return tuple(polygons)
+
+def format_regions(polygons: tuple[Polygon, ...]) -> str:
+    return "; ".join(" ".join(f"{x},{y}" for x, y in polygon) for polygon in polygons)
+
+def suppress(detections: list[Detection], threshold: float = 0.5) -> list[Detection]:
+    # overlapping regions can report the same plate twice, keep the most confident box
+    kept: list[Detection] = []
+    for detection in sorted(detections, key=lambda detection: detection[4], reverse=True):
+        if all(iou(detection[:4], other[:4]) < threshold for other in kept):
+            kept.append(detection)
+    return kept
+
+def map_detections(regions: list[Region], offsets: list[tuple[int, int]], results: list[Any | None]) -> list[Detection]:
+    detections: list[Detection] = []
+    for region, (left, top), result in zip(regions, offsets, results):
+        # None for an empty crop the detector never saw
+        if result is None:
+            continue
+        for x1, y1, x2, y2, score, class_id in result.boxes.data.tolist():
+            x1, y1, x2, y2 = x1 + left, y1 + top, x2 + left, y2 + top
+            # the crop is the bounding rectangle, only plates centred inside the polygon belong to the region
+            if region.contains((x1 + x2) / 2, (y1 + y2) / 2):
+                detections.append([x1, y1, x2, y2, score, class_id])
+    return suppress(detections) if len(regions) > 1 else detections
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import os
+import numpy as np
+import easyocr
+import torch
+from typing import Any, TYPE_CHECKING
+# onnxruntime is only imported once its backend is used, torch only installs never need it
+if TYPE_CHECKING:
+    import onnxruntime as ort
+
+DETECTOR: str = "license_plate_detector"
+TEXT_DETECTOR: str = "craft"
+TEXT_RECOGNIZER: str = "recognizer"
+
+def model_file(path_to_models: str, name: str, variant: str) -> str:
+    if variant == "torch":
+        return os.path.join(path_to_models, name + ".pt")
+    return os.path.join(path_to_models, name + (".int8.onnx" if variant == "onnx-int8" else ".onnx"))
+
+def providers(device: str) -> list[str]:
+    import onnxruntime as ort
+    if device.startswith("cuda") and "CUDAExecutionProvider" in ort.get_available_providers():
+        return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+class OnnxModule:
+    # stands in for the torch modules EasyOCR calls: takes and returns CPU tensors
+    def __init__(self, path: str, device: str) -> None:
+        import onnxruntime as ort
+        options: ort.SessionOptions = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session: ort.InferenceSession = ort.InferenceSession(path, options, providers=providers(device))
+        self.input: str = self.session.get_inputs()[0].name
+
+    def eval(self) -> OnnxModule:
+        return self
+
+    def __call__(self, image: torch.Tensor, *args: Any) -> torch.Tensor | tuple[torch.Tensor, ...]:
+        outputs: list[np.ndarray] = self.session.run(None, {self.input: image.detach().cpu().numpy().astype(np.float32, copy=False)})
+        tensors: tuple[torch.Tensor, ...] = tuple(torch.from_numpy(output) for output in outputs)
+        return tensors[0] if len(tensors) == 1 else tensors
+
+def load_onnx_reader(path_to_models: str, device: str, variant: str) -> easyocr.Reader:
+    # a missing onnxruntime fails here, before EasyOCR loads its own weights
+    import onnxruntime  # noqa: F401
+    reader: easyocr.Reader = easyocr.Reader(['en'], model_storage_directory=path_to_models, gpu=False)
+    reader.detector = OnnxModule(model_file(path_to_models, TEXT_DETECTOR, variant), device)
+    reader.recognizer = OnnxModule(model_file(path_to_models, TEXT_RECOGNIZER, variant), device)
+    reader.device = "cpu"
+    return reader
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import threading
+import queue
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Any, Callable, ClassVar
+
+class DetectionScheduler:
+    _schedulers: ClassVar[dict[tuple[Any, ...], DetectionScheduler]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get(cls, key: tuple[Any, ...], detector_factory: Callable[[], Callable[..., list[Any]]], max_batch: int, max_wait: int, imgsz: int = 640) -> DetectionScheduler:
+        # one scheduler (and one detector) per model, input size and batching policy, shared by every stream of the process
+        key = (*key, max_batch, max_wait, imgsz)
+        with cls._lock:
+            if key not in cls._schedulers:
+                cls._schedulers[key] = cls(detector_factory(), max_batch, max_wait, imgsz)
+            return cls._schedulers[key]
+
+    def __init__(self, detector: Callable[..., list[Any]], max_batch: int, max_wait: int, imgsz: int = 640) -> None:
+        self.detector: Callable[..., list[Any]] = detector
+        self.max_batch: int = max(1, max_batch)
+        self.max_wait: float = max(0, max_wait) / 1000
+        self.imgsz: int = imgsz
+        self.queue: queue.Queue[tuple[np.ndarray, Future]] = queue.Queue()
+        self.thread: threading.Thread = threading.Thread(target=self.run, name="license-plate-detection-scheduler", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame: np.ndarray) -> Future:
+        future: Future = Future()
+        self.queue.put((frame, future))
+        return future
+
+    def __call__(self, frame: np.ndarray) -> Any:
+        return self.submit(frame).result()
+
+    def detect(self, frames: list[np.ndarray]) -> list[Any]:
+        # every image of a caller (e.g. its regions of interest) is queued before waiting, so they share a batch
+        futures: list[Future] = [self.submit(frame) for frame in frames]
+        return [future.result() for future in futures]
+
+    def collect(self) -> list[tuple[np.ndarray, Future]]:
+        batch: list[tuple[np.ndarray, Future]] = [self.queue.get()]
+        deadline: float = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout: float = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return [(frame, future) for frame, future in batch if future.set_running_or_notify_cancel()]
+
+    def run(self) -> None:
+        while True:
+            batch: list[tuple[np.ndarray, Future]] = self.collect()
+            if not batch:
+                continue
+            try:
+                results: list[Any] = self.detector([frame for frame, _ in batch], verbose=False, imgsz=self.imgsz)
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
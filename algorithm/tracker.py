@@ -0,0 +1,127 @@
+from __future__ import annotations
+import itertools
+import rapidfuzz
+
+Box = tuple[int, int, int, int]
+
+# a box that grows or shrinks by more than this factor in either side is another plate, not the same one moving
+SHAPE_CHANGE: float = 1.3
+# a confident read this far (rapidfuzz ratio) from the track's plate means another plate took over the box
+HANDOVER_SIMILARITY: float = 50.0
+
+def iou(a: Box, b: Box) -> float:
+    width: int = min(a[2], b[2]) - max(a[0], b[0])
+    height: int = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection: int = width * height
+    return intersection / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection)
+
+def centroid_distance(a: Box, b: Box) -> float:
+    return (((a[0] + a[2]) - (b[0] + b[2])) ** 2 + ((a[1] + a[3]) - (b[1] + b[3])) ** 2) ** 0.5 / 2
+
+def similar_shape(a: Box, b: Box) -> bool:
+    widths: tuple[int, int] = (max(1, a[2] - a[0]), max(1, b[2] - b[0]))
+    heights: tuple[int, int] = (max(1, a[3] - a[1]), max(1, b[3] - b[1]))
+    return max(widths) <= SHAPE_CHANGE * min(widths) and max(heights) <= SHAPE_CHANGE * min(heights)
+
+class Track:
+    def __init__(self, track_id: int, box: Box, frame: int) -> None:
+        self.track_id: int = track_id
+        self.box: Box = box
+        self.last_seen: int = frame
+        self.last_read: float | None = None
+        self.votes: dict[str, float] = {}
+        self.reads: dict[str, int] = {}
+        self.license_plate: str = ""
+        self.ocr_score: float = 0.0
+        self.matched: str | None = None
+        self.label: str = ""
+        self.known: bool = False
+        self.similarity: float = 0.0
+        self.attended: str | None = None
+        self.reading: bool = False
+        # the track that took over after another plate was read in this one's box
+        self.successor: Track | None = None
+
+    def latest(self) -> Track:
+        track: Track = self
+        while track.successor is not None:
+            track = track.successor
+        return track
+
+    def vote(self, text: str, score: float, now: float) -> None:
+        self.last_read = now
+        if not text:
+            return
+        self.votes[text] = self.votes.get(text, 0.0) + score
+        self.reads[text] = self.reads.get(text, 0) + 1
+        self.license_plate = max(self.votes, key=self.votes.__getitem__)
+        self.ocr_score = self.votes[self.license_plate] / self.reads[self.license_plate]
+
+class PlateTracker:
+    def __init__(self, iou_threshold: float, max_age: int, min_confidence: float, reread_interval: float) -> None:
+        self.iou_threshold: float = iou_threshold
+        self.max_age: int = max_age
+        self.min_confidence: float = min_confidence
+        self.reread_interval: float = reread_interval
+        self.tracks: dict[int, Track] = {}
+        self.frame: int = 0
+        self.ids: itertools.count = itertools.count()
+
+    def associated(self, track: Track, box: Box) -> tuple[float, float] | None:
+        if not similar_shape(track.box, box):
+            return None
+        overlap: float = iou(track.box, box)
+        distance: float = centroid_distance(track.box, box)
+        # fall back to the centroid for small, fast plates whose boxes no longer overlap enough
+        if overlap >= self.iou_threshold or distance <= min(track.box[2] - track.box[0], track.box[3] - track.box[1]) / 2:
+            return overlap, -distance
+        return None
+
+    def update(self, boxes: list[Box]) -> list[Track]:
+        self.frame += 1
+        candidates: list[tuple[tuple[float, float], int, int]] = []
+        for track_id, track in self.tracks.items():
+            for count, box in enumerate(boxes):
+                rank: tuple[float, float] | None = self.associated(track, box)
+                if rank is not None:
+                    candidates.append((rank, track_id, count))
+        assigned: list[Track | None] = [None] * len(boxes)
+        used: set[int] = set()
+        for _, track_id, count in sorted(candidates, reverse=True):
+            if track_id in used or assigned[count] is not None:
+                continue
+            used.add(track_id)
+            assigned[count] = self.tracks[track_id]
+        for count, box in enumerate(boxes):
+            track: Track | None = assigned[count]
+            if track is None:
+                track = Track(next(self.ids), box, self.frame)
+                self.tracks[track.track_id] = track
+                assigned[count] = track
+            track.box = box
+            track.last_seen = self.frame
+        for track_id in [track_id for track_id, track in self.tracks.items() if self.frame - track.last_seen > self.max_age]:
+            del self.tracks[track_id]
+        return assigned
+
+    def vote(self, track: Track, text: str, score: float, now: float) -> Track:
+        # returns the track the read ended up in: a confident read of a different plate hands the box over to a new
+        # track, so the old plate's votes and label are not carried over to the new one
+        track = track.latest()
+        if text and track.license_plate and score >= self.min_confidence and rapidfuzz.fuzz.ratio(text, track.license_plate) < HANDOVER_SIMILARITY:
+            successor: Track = Track(next(self.ids), track.box, track.last_seen)
+            track.successor = successor
+            if self.tracks.get(track.track_id) is track:
+                del self.tracks[track.track_id]
+                self.tracks[successor.track_id] = successor
+            track = successor
+        track.vote(text, score, now)
+        return track
+
+    def needs_read(self, track: Track, now: float) -> bool:
+        # a read still in flight counts, it is not requested again for the next frame
+        if track.reading:
+            return False
+        return track.last_read is None or track.ocr_score < self.min_confidence or now - track.last_read >= self.reread_interval
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+import numpy as np
+from packages.license_plate_recognition.algorithm import LicensePlateRecognitionConfig
+from packages.license_plate_recognition.algorithm.export import load_images
+from packages.license_plate_recognition.algorithm.function import LicensePlateRecognitionFunction, LicensePlateResult
+from packages.license_plate_recognition.algorithm.runtime import DETECTOR, TEXT_DETECTOR, TEXT_RECOGNIZER, model_file
+from packages.license_plate_recognition.algorithm.tracker import iou
+
+BACKENDS: dict[str, tuple[str, bool]] = {
+    "torch": ("torch", False),
+    "onnx": ("onnxruntime", False),
+    "onnx-int8": ("onnxruntime", True),
+}
+
+def available(path_to_models: str, variant: str) -> bool:
+    return all(os.path.exists(model_file(path_to_models, name, variant)) for name in (DETECTOR, TEXT_DETECTOR, TEXT_RECOGNIZER))
+
+def run(path_to_models: str, variant: str, frames: list[np.ndarray], warmup: int) -> tuple[list[float], list[list[LicensePlateResult]]]:
+    backend, quantized = BACKENDS[variant]
+    function: LicensePlateRecognitionFunction = LicensePlateRecognitionFunction(LicensePlateRecognitionConfig(
+        path_to_models=path_to_models,
+        backend=backend,
+        quantized=quantized,
+        model_warmup=warmup,
+    ))
+    latencies: list[float] = []
+    results: list[list[LicensePlateResult]] = []
+    for frame in frames:
+        start: float = time.perf_counter()
+        results.append(function.recognize(frame))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+def agreement(reference: list[list[LicensePlateResult]], results: list[list[LicensePlateResult]]) -> dict[str, float]:
+    # boxes and plate text relative to the torch backend, which is the accuracy baseline
+    plates: int = 0
+    found: int = 0
+    same_text: int = 0
+    for expected, actual in zip(reference, results):
+        for plate in expected:
+            plates += 1
+            match: LicensePlateResult | None = max(actual, key=lambda result: iou(plate.box, result.box), default=None)
+            if match is not None and iou(plate.box, match.box) >= 0.5:
+                found += 1
+                same_text += match.license_plate == plate.license_plate
+    return {
+        "reference_plates": plates,
+        "box_recall": found / plates if plates else 1.0,
+        "text_agreement": same_text / plates if plates else 1.0,
+    }
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    milliseconds: np.ndarray = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "mean_ms": float(milliseconds.mean()),
+        "fps": float(len(latencies) / milliseconds.sum() * 1000),
+    }
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Compare latency and accuracy of the torch and ONNX Runtime backends on CPU")
+    parser.add_argument("frames", help="directory of frames to recognise")
+    parser.add_argument("--models", default="./packages/license_plate_recognition/models/")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", default="")
+    args: argparse.Namespace = parser.parse_args()
+    # every backend runs on the CPU so the comparison is like for like
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    frames: list[np.ndarray] = load_images(args.frames, args.limit)
+    report: dict[str, dict[str, float]] = {}
+    reference: list[list[LicensePlateResult]] = []
+    for variant in BACKENDS:
+        if variant != "torch" and not available(args.models, variant):
+            continue
+        latencies, results = run(args.models, variant, frames, args.warmup)
+        reference = reference or results
+        report[variant] = {**summarize(latencies), **agreement(reference, results)}
+        print(variant, json.dumps(report[variant]))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"frames": len(frames), "backends": report}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
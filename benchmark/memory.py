@@ -0,0 +1,100 @@
+from __future__ import annotations
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+import cv2
+from packages.license_plate_recognition.algorithm import LicensePlateRecognitionConfig
+from packages.license_plate_recognition.algorithm.buffers import CropScratch
+from packages.license_plate_recognition.algorithm.function import BytesOutput, LicensePlateRecognitionFunction, LicensePlateResult
+from packages.license_plate_recognition.algorithm.roi import Detection
+from packages.license_plate_recognition.benchmark.pipeline import STANDIN_MODELS, install
+from packages.license_plate_recognition.benchmark.standins import Scene
+from packages.license_plate_recognition.benchmark.synthetic import synthetic_frames, synthetic_registry
+
+class AllocatingScratch(CropScratch):
+    def take(self, height: int, width: int) -> np.ndarray:
+        return np.empty((height, width), dtype=np.uint8)
+
+class LegacyFunction(LicensePlateRecognitionFunction):
+    # the ingest path before buffer reuse: a copy for the detector, a fresh array per crop, annotation on the source
+    def __init__(self, config: LicensePlateRecognitionConfig) -> None:
+        super().__init__(config)
+        self.scratch = self.spare = AllocatingScratch(0)
+
+    def detect(self, frame: np.ndarray) -> list[Detection]:
+        return super().detect(frame.copy())
+
+    def encode_frame(self, frame: np.ndarray, res: list[LicensePlateResult], owned: bool = False, shape: tuple[int, ...] | None = None) -> BytesOutput | None:
+        if self.config.annotate:
+            self.annotate(frame, res)
+        flag, enc = cv2.imencode('.jpg', frame)
+        return BytesOutput(data=enc.tobytes()) if flag else None
+
+def measure(args: argparse.Namespace) -> dict[str, float | int | str]:
+    scene: Scene = install(args)
+    config: LicensePlateRecognitionConfig = LicensePlateRecognitionConfig(
+        path_to_models=STANDIN_MODELS,
+        expand_x=args.expand,
+        expand_y=args.expand,
+        preload_models=False,
+        model_warmup=0,
+    )
+    function: LicensePlateRecognitionFunction = LegacyFunction(config) if args.mode == "legacy" else LicensePlateRecognitionFunction(config)
+    texts: list[str] = list(synthetic_registry(100, args.seed))
+    transient: list[int] = []
+    tracemalloc.start()
+    for count, (frame, truth) in enumerate(synthetic_frames(args.warmup + args.frames, args.plates, texts, args.width, args.height, seed=args.seed)):
+        scene.plates = truth
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function.encode_frame(frame, function.recognize(frame))
+        _, peak = tracemalloc.get_traced_memory()
+        if count >= args.warmup:
+            transient.append(peak - baseline)
+    tracemalloc.stop()
+    return {
+        "mode": args.mode,
+        "frames": args.frames,
+        "resolution": f"{args.width}x{args.height}",
+        "plates_per_frame": args.plates,
+        "mean_bytes_per_frame": float(np.mean(transient)),
+        "max_bytes_per_frame": int(np.max(transient)),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Compare per-frame allocations of the ingest path before and after buffer reuse")
+    parser.add_argument("--mode", choices=["legacy", "current"], default="", help="measure one mode in this process")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--plates", type=int, default=4)
+    parser.add_argument("--expand", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="")
+    args: argparse.Namespace = parser.parse_args()
+    # stand-in models without latency, only the ingest path is of interest
+    args.detector_latency = args.reader_detect_latency = args.reader_recognize_latency = args.error_rate = 0.0
+    args.beam_cost = 1.0
+    if args.mode:
+        print(json.dumps(measure(args)))
+        return
+
+    # every mode in a fresh process so peak RSS is not shared between them
+    results: list[dict] = []
+    for mode in ("legacy", "current"):
+        command: list[str] = [sys.executable, "-m", __spec__.name, "--mode", mode, *sys.argv[1:]]
+        results.append(json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout.splitlines()[-1]))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    main()
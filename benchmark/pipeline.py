@@ -0,0 +1,187 @@
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime
+import numpy as np
+from packages.license_plate_recognition.algorithm import CascadeConfig, LicensePlateRecognitionConfig, ModelRegistry, MotionGateConfig
+from packages.license_plate_recognition.algorithm.function import LicensePlateRecognitionFunction, LicensePlateRecognitionInput, LicensePlateResult
+from packages.license_plate_recognition.algorithm.tracker import iou
+from packages.license_plate_recognition.benchmark.standins import Scene, StandInDetector, StandInReader
+from packages.license_plate_recognition.benchmark.synthetic import SyntheticPlate, synthetic_frames, synthetic_plate, synthetic_registry
+from packages.license_plate_recognition.common import double_replace
+from packages.license_plate_recognition.data.database import PlateDatabase
+from packages.license_plate_recognition.data.function import LicensePlateRecognitionDataOutput
+from packages.license_plate_recognition.matcher import PlateIndex
+from typing import Any, Callable
+
+STANDIN_MODELS: str = "standin://"
+
+PRESETS: dict[str, dict[str, Any]] = {
+    "default": {},
+    "tracking": {"tracking": True},
+    "motion_gate": {"motion_gate": MotionGateConfig(enabled=True)},
+    "batched_detection": {"detection_batch_size": 4, "detection_batch_timeout": 2},
+    "cascade": {"cascade": CascadeConfig(enabled=True)},
+}
+
+STAGES: tuple[str, ...] = ("detect", "read", "match", "encode", "frame")
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    milliseconds: np.ndarray = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "mean_ms": float(milliseconds.mean()),
+    }
+
+def instrument(function: LicensePlateRecognitionFunction, timings: dict[str, list[float]]) -> None:
+    # shadow the stage methods on the instance so every call is timed without touching the pipeline code
+    for stage, name in (("detect", "detect"), ("read", "read_async"), ("match", "match")):
+        method: Callable[..., Any] = getattr(function, name)
+
+        def timed(*args: Any, method: Callable[..., Any] = method, samples: list[float] = timings[stage]) -> Any:
+            start: float = time.perf_counter()
+            result: Any = method(*args)
+            samples.append(time.perf_counter() - start)
+            return result
+        setattr(function, name, timed)
+
+def plate_texts(registry: dict[str, str], count: int, known_ratio: float, seed: int) -> list[str]:
+    rng: random.Random = random.Random(seed)
+    known: list[str] = rng.sample(list(registry), min(len(registry), max(1, round(count * known_ratio))))
+    unknown: list[str] = []
+    while len(unknown) < count - len(known):
+        text: str = synthetic_plate(rng)
+        if text not in registry:
+            unknown.append(text)
+    return known + unknown
+
+def score(truth: list[SyntheticPlate], results: list[LicensePlateResult], registry: dict[str, str], tally: dict[str, int]) -> None:
+    for plate in truth:
+        match: LicensePlateResult | None = max(results, key=lambda result: iou(plate.box, result.box), default=None)
+        if match is None or iou(plate.box, match.box) < 0.5:
+            tally["missed"] += 1
+        elif plate.text in registry:
+            tally["known"] += 1
+            tally["known_correct"] += match.known and match.label == registry[plate.text]
+        else:
+            tally["unknown"] += 1
+            tally["false_matches"] += match.known
+
+def index_agreement(index: PlateIndex, queries: list[str], cutoff: float) -> float:
+    # the pruned, cached index must return what a full rapidfuzz scan over every plate returns
+    agreed: int = 0
+    for query in queries:
+        found, similarity = index.extract(query, cutoff)
+        expected, expected_similarity = index.exhaustive(query)
+        if expected_similarity < cutoff:
+            agreed += found < 0
+        else:
+            agreed += found == expected and similarity == expected_similarity
+    return agreed / len(queries) if queries else 1.0
+
+def install(args: argparse.Namespace) -> Scene:
+    # registered once, shared detection schedulers keep hold of the first detector they were given
+    scene: Scene = Scene()
+    ModelRegistry.put("detector", STANDIN_MODELS, StandInDetector(scene, args.detector_latency / 1000))
+    ModelRegistry.put("reader", STANDIN_MODELS, StandInReader(scene, args.reader_detect_latency / 1000, args.reader_recognize_latency / 1000, args.error_rate, args.seed, args.beam_cost))
+    return scene
+
+def measure(scene: Scene, plates_per_frame: int, registry_size: int, preset: str, args: argparse.Namespace) -> dict[str, Any]:
+    registry: dict[str, str] = synthetic_registry(registry_size, args.seed)
+    index: PlateIndex = PlateDatabase("", "", args.cache_size).normalize(registry)
+    function: LicensePlateRecognitionFunction = LicensePlateRecognitionFunction(LicensePlateRecognitionConfig(
+        path_to_models=STANDIN_MODELS,
+        data=LicensePlateRecognitionDataOutput(names=index.names, plates=index.plates, index=index),
+        preload_models=False,
+        model_warmup=0,
+        **PRESETS[preset],
+    ))
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    instrument(function, timings)
+    tally: dict[str, int] = {"known": 0, "known_correct": 0, "unknown": 0, "false_matches": 0, "missed": 0}
+    queries: list[str] = []
+    texts: list[str] = plate_texts(registry, args.vehicles, args.known_ratio, args.seed)
+
+    start: float = time.perf_counter()
+    for frame, truth in synthetic_frames(args.frames, plates_per_frame, texts, args.width, args.height, args.dwell, args.seed):
+        scene.plates = truth
+        frame_start: float = time.perf_counter()
+        function(LicensePlateRecognitionInput(frame=frame))
+        results: list[LicensePlateResult] = function.previous
+        encode_start: float = time.perf_counter()
+        function.encode_frame(frame, results)
+        function.encode_results(datetime.now(), results)
+        timings["encode"].append(time.perf_counter() - encode_start)
+        timings["frame"].append(time.perf_counter() - frame_start)
+        score(truth, results, registry, tally)
+        queries.extend(double_replace(result.license_plate) for result in results if result.license_plate)
+    elapsed: float = time.perf_counter() - start
+
+    return {
+        "plates_per_frame": plates_per_frame,
+        "registry_size": registry_size,
+        "preset": preset,
+        "frames": args.frames,
+        "fps": args.frames / elapsed,
+        "stages": {stage: percentiles(samples) for stage, samples in timings.items()},
+        "known_accuracy": tally["known_correct"] / tally["known"] if tally["known"] else 1.0,
+        "false_match_rate": tally["false_matches"] / tally["unknown"] if tally["unknown"] else 0.0,
+        "missed": tally["missed"],
+        # fraction of plates resolved by each tier of the cascade, empty without it
+        "ocr_tiers": {tier: count / sum(function.tiers.values()) for tier, count in function.tiers.items()} if sum(function.tiers.values()) else {},
+        "index_agreement": index_agreement(index, random.Random(args.seed).sample(queries, min(len(queries), args.agreement_samples)), function.config.similarity),
+    }
+
+def numbers(value: str) -> list[int]:
+    return [int(number) for number in value.split(",") if number]
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Time the recognition pipeline on synthetic frames with stand-in models")
+    parser.add_argument("--plates", type=numbers, default=[1, 4, 8], help="plates per frame, comma separated")
+    parser.add_argument("--registry", type=numbers, default=[1000, 100000], help="registry sizes, comma separated")
+    parser.add_argument("--presets", type=lambda value: value.split(","), default=list(PRESETS), help=f"comma separated, any of {', '.join(PRESETS)}")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--dwell", type=int, default=25, help="frames a plate stays in view")
+    parser.add_argument("--vehicles", type=int, default=500, help="distinct plates driving past")
+    parser.add_argument("--known-ratio", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.1, help="fraction of reads with one confused character")
+    parser.add_argument("--detector-latency", type=float, default=8.0, help="ms per detector call")
+    parser.add_argument("--reader-detect-latency", type=float, default=2.0, help="ms per text detection image")
+    parser.add_argument("--reader-recognize-latency", type=float, default=1.0, help="ms per recognised text box")
+    parser.add_argument("--beam-cost", type=float, default=3.0, help="beam search recognition time relative to greedy")
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--agreement-samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="")
+    args: argparse.Namespace = parser.parse_args()
+
+    scene: Scene = install(args)
+    results: list[dict[str, Any]] = []
+    for registry_size in args.registry:
+        for plates_per_frame in args.plates:
+            for preset in args.presets:
+                result: dict[str, Any] = measure(scene, plates_per_frame, registry_size, preset, args)
+                results.append(result)
+                print(f"{registry_size:>8} plates {plates_per_frame:>3}/frame {preset:<18} {result['fps']:8.1f} fps  frame p95 {result['stages']['frame'].get('p95_ms', 0.0):7.2f} ms  known {result['known_accuracy']:.3f}  false {result['false_match_rate']:.3f}  index {result['index_agreement']:.3f}")
+    report: dict[str, Any] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+from packages.license_plate_recognition.benchmark.synthetic import write_registry
+from packages.license_plate_recognition.common import character_replacements, double_replace, number_replacements, reorder, replace
+from packages.license_plate_recognition.data.database import PlateDatabase
+from packages.license_plate_recognition.snapshot import snapshot_path
+
+def legacy_load(path: str) -> dict[str, str]:
+    # json + per-character replace, as the data pipe loaded plates before snapshots
+    with open(path, "r") as db:
+        plates: dict[str, str] = json.load(db)
+    reordered: dict[str, str] = {}
+    for plate, name in plates.items():
+        for order in reorder(plate):
+            reordered[order] = name
+    return {replace(replace(order, number_replacements), character_replacements): name for order, name in reordered.items()}
+
+def timed(function, *args) -> tuple[float, object]:
+    start: float = time.perf_counter()
+    result: object = function(*args)
+    return time.perf_counter() - start, result
+
+def measure(size: int, directory: str) -> dict[str, float | int]:
+    path: str = os.path.join(directory, f"guests_{size}.json")
+    registry: dict[str, str] = write_registry(path, size)
+    legacy, _ = timed(legacy_load, path)
+    cold, _ = timed(PlateDatabase(path, path + ".delta", 4096).refresh)
+    database: PlateDatabase = PlateDatabase(path, path + ".delta", 4096)
+    warm, _ = timed(database.refresh)
+    query: str = double_replace(next(iter(registry)))
+    first_query, _ = timed(database.index.extract, query[:-1] + "X", 90)
+    return {
+        "plates": size,
+        "keys": len(database.index),
+        "legacy_load_s": legacy,
+        "cold_load_s": cold,
+        "warm_load_s": warm,
+        "first_query_s": first_query,
+        "snapshot_bytes": os.path.getsize(snapshot_path(path)),
+    }
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Cold vs warm (snapshot) plate database load times")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--output", default="")
+    args: argparse.Namespace = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results: list[dict[str, float | int]] = [measure(size, directory) for size in args.sizes]
+    for result in results:
+        print(f"{result['plates']:>9} plates  legacy {result['legacy_load_s']:8.3f}s  cold {result['cold_load_s']:8.3f}s  warm {result['warm_load_s']:8.3f}s  first query {1000 * result['first_query_s']:7.2f}ms")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import random
+import string
+import time
+import numpy as np
+from packages.license_plate_recognition.benchmark.synthetic import BACKGROUND_LEVEL, SyntheticPlate
+from packages.license_plate_recognition.common import number_replacements
+from typing import Any
+
+# the usual OCR confusions in both directions, e.g. 0 <-> O, 8 <-> B
+CONFUSIONS: dict[str, str] = {
+    **{digit: letter for digit, letter in number_replacements.items() if digit != letter},
+    **{letter: digit for digit, letter in number_replacements.items() if digit != letter},
+}
+
+def wait(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+class Scene:
+    # ground truth of the frame being processed, set by the benchmark before each call
+    def __init__(self) -> None:
+        self.plates: list[SyntheticPlate] = []
+
+class StandInBoxes:
+    def __init__(self, data: np.ndarray) -> None:
+        self.data: np.ndarray = data
+        self.cls: np.ndarray = data[:, 5]
+
+class StandInResults:
+    def __init__(self, boxes: StandInBoxes) -> None:
+        self.boxes: StandInBoxes = boxes
+
+class StandInDetector:
+    # answers like an ultralytics model with the scene's plate boxes after a fixed latency
+    def __init__(self, scene: Scene, latency: float, per_frame: float = 0.0, score: float = 0.9) -> None:
+        self.scene: Scene = scene
+        self.latency: float = latency
+        self.per_frame: float = per_frame
+        self.score: float = score
+
+    def __call__(self, frames: np.ndarray | list[np.ndarray], verbose: bool = False, **parameters: Any) -> list[StandInResults]:
+        batch: list[np.ndarray] = frames if isinstance(frames, list) else [frames]
+        wait(self.latency + self.per_frame * len(batch))
+        data: np.ndarray = np.asarray([[*plate.box, self.score, 0] for plate in self.scene.plates], dtype=np.float32).reshape(-1, 6)
+        return [StandInResults(StandInBoxes(data)) for _ in batch]
+
+class StandInReader:
+    # answers like an easyocr.Reader: the plate is identified by the grey level of its background
+    def __init__(self, scene: Scene, detect_latency: float, recognize_latency: float, error_rate: float = 0.0, seed: int = 0, beam_cost: float = 1.0) -> None:
+        self.scene: Scene = scene
+        self.detect_latency: float = detect_latency
+        self.recognize_latency: float = recognize_latency
+        # how much slower a beam search read is than a greedy one
+        self.beam_cost: float = beam_cost
+        self.error_rate: float = error_rate
+        self.rng: random.Random = random.Random(seed)
+
+    def detect(self, images: np.ndarray, reformat: bool = False, **parameters: Any) -> tuple[list[list[list[int]]], list[list[Any]]]:
+        wait(self.detect_latency * len(images))
+        return [[[0, image.shape[1], 0, image.shape[0]]] for image in images], [[] for _ in images]
+
+    def recognize(self, grey: np.ndarray, horizontal_list: list[list[int]], free_list: list[Any], reformat: bool = False, **parameters: Any) -> list[tuple[list[list[int]], str, float]]:
+        wait(self.recognize_latency * len(horizontal_list) * (self.beam_cost if parameters.get("decoder") == "beamsearch" else 1.0))
+        plate: SyntheticPlate | None = self.lookup(grey)
+        if plate is None:
+            return []
+        text, score = self.corrupt(plate.text)
+        return [([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], text, score) for x1, x2, y1, y2 in horizontal_list]
+
+    def readtext(self, image: np.ndarray, **parameters: Any) -> list[Any]:
+        wait(self.detect_latency + self.recognize_latency)
+        return []
+
+    def lookup(self, grey: np.ndarray) -> SyntheticPlate | None:
+        bright: np.ndarray = grey[grey > BACKGROUND_LEVEL]
+        if not bright.size or not self.scene.plates:
+            return None
+        level: int = int(np.bincount(bright).argmax())
+        plate: SyntheticPlate = min(self.scene.plates, key=lambda plate: abs(plate.level - level))
+        return plate if abs(plate.level - level) <= 2 else None
+
+    def corrupt(self, text: str) -> tuple[str, float]:
+        if self.rng.random() >= self.error_rate:
+            return text, 0.9
+        position: int = self.rng.randrange(len(text))
+        character: str = CONFUSIONS.get(text[position], self.rng.choice(string.ascii_uppercase))
+        return text[:position] + character + text[position + 1:], 0.6
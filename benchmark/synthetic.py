@@ -0,0 +1,81 @@
+from __future__ import annotations
+import json
+import math
+import random
+import string
+import numpy as np
+import cv2
+from typing import Iterator, NamedTuple
+
+def synthetic_plate(rng: random.Random) -> str:
+    return "".join([
+        "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 3))),
+        "".join(rng.choices(string.digits, k=rng.randint(1, 4))),
+        "".join(rng.choices(string.ascii_uppercase, k=rng.randint(0, 3))),
+    ])
+
+def synthetic_registry(size: int, seed: int = 0) -> dict[str, str]:
+    rng: random.Random = random.Random(seed)
+    registry: dict[str, str] = {}
+    while len(registry) < size:
+        registry[synthetic_plate(rng)] = f"Guest {len(registry)}"
+    return registry
+
+def write_registry(path: str, size: int, seed: int = 0) -> dict[str, str]:
+    registry: dict[str, str] = synthetic_registry(size, seed)
+    with open(path, "w") as db:
+        json.dump(registry, db)
+    return registry
+
+class SyntheticPlate(NamedTuple):
+    text: str
+    box: tuple[int, int, int, int]
+    level: int
+
+# every plate of a frame gets its own background grey level, stand-in readers tell plates apart by it
+PLATE_LEVELS: tuple[int, ...] = tuple(range(255, 150, -5))
+BACKGROUND_LEVEL: int = 120
+# keeps plates clear of the cell borders so expanded crops stay inside the frame
+MARGIN: int = 16
+
+def render_plate(frame: np.ndarray, plate: SyntheticPlate) -> None:
+    x1, y1, x2, y2 = plate.box
+    height: int = y2 - y1
+    cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), (plate.level, plate.level, plate.level), cv2.FILLED)
+    cv2.putText(frame, plate.text, (x1 + height // 5, y2 - height // 4), cv2.FONT_HERSHEY_SIMPLEX, height / 40, (0, 0, 0), max(1, height // 15))
+
+def plate_size(text: str, height: int) -> tuple[int, int]:
+    (width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, height / 40, max(1, height // 15))
+    return width + 2 * (height // 5), height
+
+def synthetic_frames(count: int, plates_per_frame: int, texts: list[str], width: int = 1280, height: int = 720, dwell: int = 25, seed: int = 0) -> Iterator[tuple[np.ndarray, list[SyntheticPlate]]]:
+    # a static noisy background with plates drifting down their own grid cell, a new plate enters a cell every `dwell` frames
+    if plates_per_frame > len(PLATE_LEVELS):
+        raise ValueError(f"at most {len(PLATE_LEVELS)} plates per frame are supported")
+    rng: random.Random = random.Random(seed)
+    background: np.ndarray = np.random.default_rng(seed).integers(0, BACKGROUND_LEVEL, (height, width, 3), dtype=np.uint8)
+    columns: int = max(1, math.ceil(math.sqrt(plates_per_frame * width / height)))
+    rows: int = math.ceil(plates_per_frame / columns)
+    cell_width: int = width // columns
+    cell_height: int = height // rows
+    plate_height: int = max(12, min(60, (cell_height - 2 * MARGIN) // 3))
+    cells: list[tuple[str, int, int, int]] = [("", 0, 0, 0)] * plates_per_frame
+    for number in range(count):
+        frame: np.ndarray = background.copy()
+        plates: list[SyntheticPlate] = []
+        for cell in range(plates_per_frame):
+            text, x, y, start = cells[cell]
+            if not text or number - start >= dwell:
+                text = rng.choice(texts)
+                plate_width, _ = plate_size(text, plate_height)
+                x = rng.randint(MARGIN, max(MARGIN, cell_width - plate_width - MARGIN))
+                y = rng.randint(MARGIN, max(MARGIN, cell_height // 2 - plate_height))
+                start = number
+                cells[cell] = (text, x, y, start)
+            plate_width, _ = plate_size(text, plate_height)
+            left: int = (cell % columns) * cell_width + x
+            top: int = (cell // columns) * cell_height + min(cell_height - plate_height - MARGIN, y + 2 * (number - start))
+            plate: SyntheticPlate = SyntheticPlate(text, (left, top, min(width, left + plate_width), top + plate_height), PLATE_LEVELS[cell])
+            render_plate(frame, plate)
+            plates.append(plate)
+        yield frame, plates
@@ -1,22 +1,42 @@
-def reordered_plates(plates):
-    # plates = {} # plate: name
-    reordered_plates = {}
+import re
 
-    for i in plates:
-        if (len(i) > 1) and i[-1].isalpha() and i[-2].isalpha():
-            c = -1
-            while ((-c) <= len(i)) and i[c].isalpha():
-                c -= 1
+trailing_letters = re.compile(r"[A-Za-z]*$")
+leading_letters = re.compile(r"[A-Za-z]*")
+
+def reorder(i):
+    if i.isascii():
+        # same split as below, found by the regex engine instead of a Python loop
+        k = len(i) - trailing_letters.search(i).start()
+        if k > 1:
+            c = max(0, len(i) - k - 1)
             front = i[c:]
             back = i[:c]
         else:
-            c = 0
-            while (c < len(i)) and i[c].isalpha():
-                c += 1
+            c = leading_letters.match(i).end()
             front = i[:c]
             back = i[c:]
-        reordered_plates[front+back] = plates[i]
-        reordered_plates[back+front] = plates[i]
+        return front+back, back+front
+    if (len(i) > 1) and i[-1].isalpha() and i[-2].isalpha():
+        c = -1
+        while ((-c) <= len(i)) and i[c].isalpha():
+            c -= 1
+        front = i[c:]
+        back = i[:c]
+    else:
+        c = 0
+        while (c < len(i)) and i[c].isalpha():
+            c += 1
+        front = i[:c]
+        back = i[c:]
+    return front+back, back+front
+
+def reordered_plates(plates):
+    # plates = {} # plate: name
+    reordered_plates = {}
+
+    for i in plates:
+        for order in reorder(i):
+            reordered_plates[order] = plates[i]
 
     # replace twice by mapping dict
     return {double_replace(i): reordered_plates[i] for i in reordered_plates}
@@ -45,8 +65,18 @@ character_replacements = {
     "U": "V",
 }
 
+number_table = str.maketrans(number_replacements)
+character_table = str.maketrans(character_replacements)
+
 def replace(origin, mapping):
     return "".join(mapping[char] if char in mapping else char for char in origin)
 
 def double_replace(plate):
-    return replace(replace(plate, number_replacements), character_replacements)
+    return plate.translate(number_table).translate(character_table)
+
+def double_replace_all(plates):
+    # one translate pass over every plate at once, split back on a separator no plate contains
+    joined = "\0".join(plates)
+    if not plates or joined.count("\0") != len(plates) - 1:
+        return [double_replace(plate) for plate in plates]
+    return joined.translate(number_table).translate(character_table).split("\0")
@@ -1,3 +1,4 @@
 from packages.license_plate_recognition.data.config import LicensePlateRecognitionDataConfig, LicensePlateRecognitionDataConfigUI
+from packages.license_plate_recognition.data.database import PlateDatabase, PlateDiff
 from packages.license_plate_recognition.data.function import LicensePlateRecognitionDataFunction, LicensePlateRecognitionDataOutput
 from packages.license_plate_recognition.data.pipe import LicensePlateRecognitionDataPipe
@@ -10,6 +10,11 @@ if TYPE_CHECKING:
 class LicensePlateRecognitionDataConfig(Config):
     name: str = "License Plate Recognition Data"
     db_path: str = "./../../guests.json"
+    match_cache_size: int = 4096
+    watch: bool = False
+    poll_interval: float = 2.0
+    delta_path: str = ""
+    snapshot: bool = True
 
 class LicensePlateRecognitionDataConfigUI(ConfigUI):
     def __init__(self, instance: LicensePlateRecognitionDataPipe, manager: Manager, config_page: ConfigPage, content: ft.Control | None = None) -> None:
@@ -17,10 +22,20 @@ class LicensePlateRecognitionDataConfigUI(ConfigUI):
         super().__init__(instance, manager, config_page, ft.Column(spacing=20, controls=[
             ft.TextField(self.instance.config.name, label="Unique Database Name", border_color="grey"),
             ft.TextField(self.instance.config.db_path, label="Database Path", border_color="grey"),
+            ft.TextField(str(self.instance.config.match_cache_size), label="Cached Recent Matches", border_color="grey", input_filter=ft.NumbersOnlyInputFilter()),
+            ft.Switch(label="Reload Database on Change", value=self.instance.config.watch),
+            ft.TextField(str(self.instance.config.poll_interval), label="Poll Interval (s)", border_color="grey", input_filter=ft.InputFilter(allow=True, regex_string=r"[0-9\.]", replacement_string="")),
+            ft.TextField(self.instance.config.delta_path, label="Delta File Path (defaults to Database Path + .delta)", border_color="grey"),
+            ft.Switch(label="Cache Compiled Snapshot next to Database", value=self.instance.config.snapshot),
         ]))
 
     def dismiss(self) -> None:
         self.instance.config = LicensePlateRecognitionDataConfig(
             name=self.content.controls[0].value,
             db_path=self.content.controls[1].value,
+            match_cache_size=int(self.content.controls[2].value),
+            watch=self.content.controls[3].value,
+            poll_interval=float(self.content.controls[4].value),
+            delta_path=self.content.controls[5].value,
+            snapshot=self.content.controls[6].value,
         )
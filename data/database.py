@@ -0,0 +1,332 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import numpy as np
+from collections.abc import Iterator, Mapping, Sequence
+from packages.license_plate_recognition.common import double_replace_all, reorder
+from packages.license_plate_recognition.matcher import OverlayIndex, PlateIndex
+from packages.license_plate_recognition.snapshot import SnapshotPlates, read_snapshot, snapshot_path, source_digest, write_snapshot
+from typing import ClassVar, NamedTuple
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# delta entries are overlaid on the base index until they reach this share of its keys (or at least COMPACT_MINIMUM),
+# then everything is normalised into a new base
+COMPACT_RATIO: float = 0.05
+COMPACT_MINIMUM: int = 1024
+
+class PlateDiff(NamedTuple):
+    added: Mapping[str, str]
+    removed: Mapping[str, str]
+    changed: Mapping[str, str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+def file_state(path: str) -> tuple[int, int] | None:
+    try:
+        stat: os.stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def diff(old: Mapping[str, str], new: Mapping[str, str], plates: set[str] | None = None) -> PlateDiff:
+    # only the given plates are compared when the caller knows which ones can differ
+    if plates is not None:
+        old = {plate: old[plate] for plate in plates if plate in old}
+        new = {plate: new[plate] for plate in plates if plate in new}
+    else:
+        # compared as dicts, a snapshot base would otherwise be searched once per plate
+        old, new = dict(old.items()), dict(new.items())
+    return PlateDiff(
+        added={plate: name for plate, name in new.items() if plate not in old},
+        removed={plate: name for plate, name in old.items() if plate not in new},
+        changed={plate: name for plate, name in new.items() if plate in old and old[plate] != name},
+    )
+
+class LayeredPlates(Mapping):
+    # the base plates with the delta entries applied on top, without copying the base; a None name removes the plate
+    def __init__(self, base: Mapping[str, str], overrides: Mapping[str, str | None]) -> None:
+        self.base: Mapping[str, str] = base
+        self.overrides: Mapping[str, str | None] = overrides
+        self.count: int = len(base)
+        for plate, name in overrides.items():
+            self.count += (name is not None) - (plate in base)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        for plate in self.base:
+            if plate not in self.overrides:
+                yield plate
+        for plate, name in self.overrides.items():
+            if name is not None:
+                yield plate
+
+    def __getitem__(self, plate: str) -> str:
+        if plate in self.overrides:
+            name: str | None = self.overrides[plate]
+            if name is None:
+                raise KeyError(plate)
+            return name
+        return self.base[plate]
+
+    def __contains__(self, plate: object) -> bool:
+        if plate in self.overrides:
+            return self.overrides[plate] is not None
+        return plate in self.base
+
+    def items(self) -> Iterator[tuple[str, str]]:
+        for plate, name in self.base.items():
+            if plate not in self.overrides:
+                yield plate, name
+        for plate, name in self.overrides.items():
+            if name is not None:
+                yield plate, name
+
+class KeyOwners:
+    # the raw base plates behind every key of the base index, so a delta only hides a key no other base plate maps to
+    def __init__(self, plates: Sequence[str], names: Sequence[str], keys: np.ndarray) -> None:
+        self.plates: Sequence[str] = plates
+        self.names: Sequence[str] = names
+        flat: np.ndarray = keys.ravel()
+        self.order: np.ndarray = np.argsort(flat, kind="stable")
+        self.keys: np.ndarray = flat[self.order]
+
+    def find(self, key: int) -> list[int]:
+        start: int = int(np.searchsorted(self.keys, key, "left"))
+        end: int = int(np.searchsorted(self.keys, key, "right"))
+        # both orders of a plate can share a key, in base order so the last one names it like a full rebuild would
+        return sorted({int(position) // 2 for position in self.order[start:end]})
+
+class PlateDatabase:
+    _databases: ClassVar[dict[tuple[str, str, int, bool], PlateDatabase]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str, delta_path: str, cache_size: int, snapshots: bool = True) -> PlateDatabase:
+        key: tuple[str, str, int, bool] = (os.path.abspath(db_path), os.path.abspath(delta_path), cache_size, snapshots)
+        with cls._lock:
+            if key not in cls._databases:
+                cls._databases[key] = cls(db_path, delta_path, cache_size, snapshots)
+                cls._databases[key].key = key
+            database: PlateDatabase = cls._databases[key]
+        database.acquire()
+        return database
+
+    def __init__(self, db_path: str, delta_path: str, cache_size: int, snapshots: bool = True) -> None:
+        self.db_path: str = db_path
+        self.delta_path: str = delta_path
+        self.cache_size: int = cache_size
+        self.snapshots: bool = snapshots
+        self.plates: Mapping[str, str] = {}
+        self.base: Mapping[str, str] = {}
+        self.base_index: PlateIndex = PlateIndex([], [], cache_size)
+        # delta entries applied since the base index was built, by raw plate
+        self.overrides: dict[str, str | None] = {}
+        self.compacted: bool = False
+        # the positions of the two keys of every base plate, in base order, and their owners built from them on demand
+        self.plate_keys: np.ndarray = np.zeros((0, 2), dtype=np.int64)
+        self.owners: KeyOwners | None = None
+        self.base_state: tuple[int, int] | None = None
+        self.delta_state: tuple[int, int] | None = None
+        self.delta_offset: int = 0
+        # normalisation results survive reloads so only new plates pay for reorder/double_replace
+        self.orders: dict[str, tuple[str, str]] = {}
+        self.replaced: dict[str, str] = {}
+        self.index: PlateIndex | OverlayIndex = self.base_index
+        self.version: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.interval: float = 0.0
+        self.stopped: threading.Event = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.key: tuple[str, str, int, bool] | None = None
+        # data functions and the recognition functions matching against it, the last one to let go stops the watcher
+        self.users: int = 0
+
+    def read_delta(self, offset: int) -> tuple[list[tuple[str, str | None]], int]:
+        # append-only JSON lines of {"plate": ..., "name": ...}; a null name removes the plate
+        with open(self.delta_path, "rb") as delta:
+            delta.seek(offset)
+            data: bytes = delta.read()
+        end: int = data.rfind(b"\n") + 1
+        entries: list[tuple[str, str | None]] = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry: dict[str, str | None] = json.loads(line)
+                entries.append((entry["plate"], entry.get("name")))
+        return entries, offset + end
+
+    def load_base(self) -> tuple[Mapping[str, str], PlateIndex]:
+        with open(self.db_path, "rb") as db:
+            data: bytes = db.read()
+        if self.snapshots:
+            digest: str = source_digest(data)
+            snapshot: tuple[SnapshotPlates, PlateIndex] | None = read_snapshot(snapshot_path(self.db_path), digest, self.cache_size)
+            if snapshot is not None:
+                self.plate_keys = snapshot[0].keys
+                return snapshot
+        base: dict[str, str] = json.loads(data)
+        index: PlateIndex = self.normalize(base)
+        if self.snapshots:
+            try:
+                write_snapshot(snapshot_path(self.db_path), digest, base, index, self.plate_keys)
+            except OSError:
+                logger.exception("Writing plate database snapshot for %s failed", self.db_path)
+        return base, index
+
+    def refresh(self) -> PlateDiff:
+        with self.lock:
+            base_state: tuple[int, int] | None = file_state(self.db_path)
+            delta_state: tuple[int, int] | None = file_state(self.delta_path)
+            if self.version and base_state == self.base_state and delta_state == self.delta_state:
+                return PlateDiff({}, {}, {})
+
+            overrides: dict[str, str | None] = dict(self.overrides)
+            # the plates that can differ from the current ones, None when the base itself changed
+            affected: set[str] | None = set()
+            truncated: bool = delta_state is None or delta_state[1] < self.delta_offset
+            # a compacted base already holds delta entries, so a truncated delta is replayed on the reloaded file
+            if not self.version or base_state != self.base_state or truncated and self.compacted:
+                self.base, self.base_index = self.load_base()
+                self.owners = None
+                self.base_state = base_state
+                self.compacted = False
+                self.delta_offset = 0
+                overrides = {}
+                affected = None
+            elif truncated:
+                # the delta file was truncated or rotated, replay it on top of the base
+                self.delta_offset = 0
+                affected.update(overrides)
+                overrides = {}
+
+            if delta_state is not None:
+                entries, self.delta_offset = self.read_delta(self.delta_offset)
+                overrides.update(entries)
+                if affected is not None:
+                    affected.update(plate for plate, _ in entries)
+            self.delta_state = delta_state
+
+            plates: LayeredPlates = LayeredPlates(self.base, overrides)
+            changes: PlateDiff = diff(self.plates, plates, affected) if self.version else PlateDiff(plates, {}, {})
+            if changes or not self.version:
+                self.apply(plates, overrides)
+                logger.info("Plate database %s v%d: %d added, %d removed, %d changed", self.db_path, self.version, len(changes.added), len(changes.removed), len(changes.changed))
+            return changes
+
+    def normalize(self, plates: Mapping[str, str]) -> PlateIndex:
+        orders: dict[str, tuple[str, str]] = {}
+        reordered: dict[str, str] = {}
+        for plate, name in plates.items():
+            orders[plate] = self.orders[plate] if plate in self.orders else reorder(plate)
+            for order in orders[plate]:
+                reordered[order] = name
+        missing: list[str] = [order for order in reordered if order not in self.replaced]
+        replaced: dict[str, str] = {order: self.replaced[order] for order in reordered if order in self.replaced}
+        replaced.update(zip(missing, double_replace_all(missing)))
+        normalized: dict[str, str] = {replaced[order]: name for order, name in reordered.items()}
+        positions: dict[str, int] = {key: count for count, key in enumerate(normalized)}
+        self.plate_keys = np.fromiter(
+            (positions[replaced[order]] for plate in plates for order in orders[plate]), dtype=np.int64, count=2 * len(orders),
+        ).reshape(-1, 2)
+        self.orders = orders
+        self.replaced = replaced
+        return PlateIndex(list(normalized.values()), list(normalized.keys()), self.cache_size)
+
+    def normalize_plate(self, plate: str) -> list[str]:
+        orders: tuple[str, str] = self.orders[plate] if plate in self.orders else reorder(plate)
+        missing: list[str] = [order for order in orders if order not in self.replaced]
+        self.replaced.update(zip(missing, double_replace_all(missing)))
+        return [self.replaced[order] for order in orders]
+
+    def key_owners(self) -> KeyOwners:
+        if self.owners is None:
+            if isinstance(self.base, SnapshotPlates):
+                self.owners = KeyOwners(self.base.plates, self.base.names, self.plate_keys)
+            else:
+                self.owners = KeyOwners(list(self.base), list(self.base.values()), self.plate_keys)
+        return self.owners
+
+    def overlay(self, overrides: Mapping[str, str | None]) -> OverlayIndex:
+        hidden: np.ndarray = np.zeros(len(self.base_index), dtype=bool)
+        added: dict[str, str] = {}
+        touched: set[int] = set()
+        for plate, name in overrides.items():
+            for key in self.normalize_plate(plate):
+                found: int = self.base_index.find(key)
+                if found >= 0:
+                    touched.add(found)
+                if name is not None:
+                    added[key] = name
+        for found in touched:
+            hidden[found] = True
+            key: str = self.base_index.plates[found]
+            if key in added:
+                continue
+            # "AB10" and "AB1O" share a key, removing one must not make the other unknown
+            owners: KeyOwners = self.key_owners()
+            survivors: list[int] = [owner for owner in owners.find(found) if owners.plates[owner] not in overrides]
+            if not survivors:
+                continue
+            if self.base_index.names[found] in {owners.names[owner] for owner in survivors}:
+                hidden[found] = False
+            else:
+                added[key] = owners.names[survivors[-1]]
+        return OverlayIndex(self.base_index, list(added.values()), list(added.keys()), hidden, self.cache_size)
+
+    def apply(self, plates: LayeredPlates, overrides: dict[str, str | None]) -> None:
+        if not overrides:
+            index: PlateIndex | OverlayIndex = self.base_index
+        elif len(overrides) > max(COMPACT_MINIMUM, COMPACT_RATIO * len(self.base_index)):
+            # compacted in memory only, the files and their snapshot are left as they are
+            self.base = dict(plates.items())
+            self.base_index = index = self.normalize(self.base)
+            self.owners = None
+            self.compacted = True
+            overrides = {}
+        else:
+            index: PlateIndex | OverlayIndex = self.overlay(overrides)
+        # a single reference swap, readers see either the old or the new index and never a mix
+        self.plates = LayeredPlates(self.base, overrides)
+        self.overrides = overrides
+        self.index = index
+        self.version += 1
+
+    def poll(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Reloading plate database %s failed", self.db_path)
+
+    def watch(self, interval: float) -> None:
+        self.interval = max(0.1, interval)
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.poll, name="license-plate-database-watcher", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def acquire(self) -> None:
+        with PlateDatabase._lock:
+            self.users += 1
+        # a database its last user stopped polls again for the next one
+        if self.interval:
+            self.watch(self.interval)
+
+    def release(self) -> None:
+        with PlateDatabase._lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if PlateDatabase._databases.get(self.key) is self:
+                del PlateDatabase._databases[self.key]
+        self.stop()
@@ -1,7 +1,6 @@
 from __future__ import annotations
-import json
-import numpy as np
-from packages.license_plate_recognition.common import reordered_plates
+from packages.license_plate_recognition.data.database import PlateDatabase
+from packages.license_plate_recognition.matcher import PlateIndex
 from src.pipe.function import IO, Function
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -11,6 +10,8 @@ class LicensePlateRecognitionDataOutput(IO):
     name: str = "License Plate Recognition Data"
     names: list[str] = []
     plates: list[str] = []
+    index: PlateIndex | None = None
+    database: PlateDatabase | None = None
 
 class LicensePlateRecognitionDataFunction(Function):
     cls_output: type[LicensePlateRecognitionDataOutput] = LicensePlateRecognitionDataOutput
@@ -30,16 +31,22 @@ class LicensePlateRecognitionDataFunction(Function):
         return biggest
 
     def __call__(self, input: IO = IO()) -> LicensePlateRecognitionDataOutput:
-        plates_to_names = reordered_plates(json.load(open(self.config.db_path, "r")))
-        names: list[str] = []
-        plates: list[str] = []
-
-        for plate, name in plates_to_names.items():
-            names.append(name)
-            plates.append(plate)
+        database: PlateDatabase = PlateDatabase.get(self.config.db_path, self.config.delta_path or self.config.db_path + ".delta", self.config.match_cache_size, self.config.snapshot)
+        try:
+            database.refresh()
+        except BaseException:
+            database.release()
+            raise
+        if self.config.watch:
+            # the output holds this reference until the data pipe stops, recognition functions matching against it take their own
+            database.watch(self.config.poll_interval)
+        else:
+            database.release()
 
         return LicensePlateRecognitionDataOutput(
             name=self.config.name,
-            names=names,
-            plates=plates,
+            names=database.index.names,
+            plates=database.index.plates,
+            index=database.index,
+            database=database if self.config.watch else None,
         )
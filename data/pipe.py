@@ -29,3 +29,6 @@ class LicensePlateRecognitionDataPipe(pipe.Pipe):
         self.playing = False
         if result:
             manager.data[self.config.name] = result
+            if result.database:
+                # the watcher keeps polling only while recognition functions still match against it
+                result.database.release()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import bisect
+import numpy as np
+import rapidfuzz
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Sequence
+
+# WRatio weights partial matches by these factors once the lengths differ by 1.5x / 8x
+PARTIAL_RATIO: float = 1.5
+PARTIAL_SCALE: float = 0.9
+LONG_RATIO: float = 8.0
+LONG_SCALE: float = 0.6
+
+def upper_bound(common: int, query_length: int, key_length: int) -> float:
+    # best WRatio two whitespace-free strings sharing `common` characters (as a multiset) can reach
+    if not query_length or not key_length:
+        return 0.0
+    shorter: int = min(query_length, key_length)
+    length_ratio: float = max(query_length, key_length) / shorter
+    bound: float = 200 * common / (query_length + key_length)
+    if length_ratio >= PARTIAL_RATIO:
+        scale: float = PARTIAL_SCALE if length_ratio <= LONG_RATIO else LONG_SCALE
+        bound = max(bound, scale * 200 * common / (shorter + common))
+    return bound
+
+class IndexArrays(NamedTuple):
+    alphabet: str
+    keys: np.ndarray
+    lengths: np.ndarray
+    counts: np.ndarray
+    unprunable: np.ndarray
+    ordered: np.ndarray
+
+def build_arrays(plates: Sequence[str]) -> IndexArrays:
+    first: dict[str, int] = {}
+    for count, plate in enumerate(plates):
+        first.setdefault(plate, count)
+    unique: np.ndarray = np.fromiter(first.values(), dtype=np.int64, count=len(first))
+    lengths: np.ndarray = np.fromiter(map(len, first), dtype=np.int64, count=len(first))
+    order: np.ndarray = np.argsort(lengths, kind="stable")
+    keys: np.ndarray = unique[order]
+    lengths = lengths[order]
+
+    # count every character of every key in one pass over the code points of all keys
+    text: str = "".join(plates[count] for count in keys.tolist())
+    codes: np.ndarray = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    alphabet: np.ndarray = np.unique(codes)
+    rows: np.ndarray = np.repeat(np.arange(len(keys), dtype=np.int64), lengths)
+    counts: np.ndarray = np.bincount(rows * len(alphabet) + np.searchsorted(alphabet, codes), minlength=len(keys) * len(alphabet))
+    # plates with whitespace go through token based scorers and long ones could overflow the counts, never prune them
+    spaces: np.ndarray = np.zeros(len(keys), dtype=bool)
+    space_columns: list[int] = [column for column, code in enumerate(alphabet.tolist()) if chr(code).isspace()]
+    if space_columns:
+        spaces = counts.reshape(len(keys), len(alphabet))[:, space_columns].any(axis=1)
+    return IndexArrays(
+        alphabet="".join(map(chr, alphabet.tolist())),
+        keys=keys,
+        lengths=lengths,
+        counts=np.minimum(counts, 255).astype(np.uint8).reshape(len(keys), len(alphabet)),
+        unprunable=np.sort(keys[spaces | (lengths > 255)]),
+        ordered=unique[np.argsort(np.asarray(list(first)), kind="stable")] if first else unique,
+    )
+
+class CachedIndex(ABC):
+    def __init__(self, cache_size: int) -> None:
+        self.cache_size: int = cache_size
+        self.cache: OrderedDict[tuple[str, float], tuple[int, float]] = OrderedDict()
+        # one index serves every stream of the process, the scan itself runs outside the lock
+        self.lock: threading.Lock = threading.Lock()
+
+    @abstractmethod
+    def search(self, query: str, score_cutoff: float) -> tuple[int, float]:
+        ...
+
+    def extract(self, query: str, score_cutoff: float) -> tuple[int, float]:
+        key: tuple[str, float] = (query, score_cutoff)
+        with self.lock:
+            cached: tuple[int, float] | None = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                return cached
+        result: tuple[int, float] = self.search(query, score_cutoff)
+        if self.cache_size > 0:
+            with self.lock:
+                self.cache[key] = result
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return result
+
+class PlateIndex(CachedIndex):
+    def __init__(self, names: Sequence[str], plates: Sequence[str], cache_size: int = 4096, arrays: IndexArrays | None = None) -> None:
+        super().__init__(cache_size)
+        self.names: Sequence[str] = names
+        self.plates: Sequence[str] = plates
+        self.arrays: IndexArrays = arrays if arrays is not None else build_arrays(plates)
+        self.alphabet: dict[str, int] = {char: column for column, char in enumerate(self.arrays.alphabet)}
+        self.keys: np.ndarray = self.arrays.keys
+        self.lengths: np.ndarray = self.arrays.lengths
+        self.counts: np.ndarray = self.arrays.counts
+        self.unprunable: np.ndarray = self.arrays.unprunable
+        self.ordered: np.ndarray = self.arrays.ordered
+        self.buckets: dict[int, tuple[int, int]] = {}
+        for length in np.unique(self.lengths).tolist():
+            self.buckets[length] = (int(np.searchsorted(self.lengths, length, "left")), int(np.searchsorted(self.lengths, length, "right")))
+
+    def find(self, query: str) -> int:
+        position: int = bisect.bisect_left(self.ordered, query, key=lambda count: self.plates[count])
+        if position < len(self.ordered) and self.plates[self.ordered[position]] == query:
+            return int(self.ordered[position])
+        return -1
+
+    def __len__(self) -> int:
+        return len(self.plates)
+
+    def candidates(self, query: str, score_cutoff: float) -> np.ndarray:
+        if any(char.isspace() for char in query):
+            return np.sort(self.keys)
+        columns: dict[int, int] = {}
+        for char in query:
+            if char in self.alphabet:
+                columns[self.alphabet[char]] = columns.get(self.alphabet[char], 0) + 1
+        selected: np.ndarray = np.fromiter(columns.keys(), dtype=np.int64, count=len(columns))
+        wanted: np.ndarray = np.fromiter(columns.values(), dtype=np.uint8, count=len(columns))
+        found: list[np.ndarray] = [self.unprunable]
+        for length, (start, end) in self.buckets.items():
+            # smallest multiset overlap that could still reach the cutoff for this key length
+            needed: int = next((common for common in range(min(len(query), length) + 1) if upper_bound(common, len(query), length) >= score_cutoff - 1e-6), -1)
+            if needed < 0:
+                continue
+            if needed == 0:
+                found.append(self.keys[start:end])
+                continue
+            common: np.ndarray = np.minimum(self.counts[start:end][:, selected], wanted).sum(axis=1, dtype=np.int64)
+            found.append(self.keys[start:end][common >= needed])
+        return np.unique(np.concatenate(found))
+
+    def search(self, query: str, score_cutoff: float, hidden: np.ndarray | None = None) -> tuple[int, float]:
+        # hidden marks keys that must not match, e.g. the ones a delta replaced or removed
+        exact: int = self.find(query)
+        if exact >= 0 and (hidden is None or not hidden[exact]):
+            return exact, 100.0
+        # candidates stay in the original order so ties resolve like an exhaustive scan
+        found: np.ndarray = self.candidates(query, score_cutoff)
+        if hidden is not None:
+            found = found[~hidden[found]]
+        candidates: list[int] = found.tolist()
+        fuzzed = rapidfuzz.process.extractOne(query, [self.plates[count] for count in candidates], score_cutoff=score_cutoff)
+        return (candidates[fuzzed[2]], fuzzed[1]) if fuzzed else (-1, 0.0)
+
+    def exhaustive(self, query: str) -> tuple[int, float]:
+        fuzzed = rapidfuzz.process.extractOne(query, self.plates)
+        return (fuzzed[2], fuzzed[1]) if fuzzed else (-1, 0.0)
+
+class ChainedTable(Sequence):
+    def __init__(self, first: Sequence[str], second: Sequence[str]) -> None:
+        self.first: Sequence[str] = first
+        self.second: Sequence[str] = second
+
+    def __len__(self) -> int:
+        return len(self.first) + len(self.second)
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self[count] for count in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.first[index] if index < len(self.first) else self.second[index - len(self.first)]
+
+class OverlayIndex(CachedIndex):
+    # a large base index plus the few keys a delta touched since it was built: the new keys get a small index of their own
+    # and the replaced or removed ones are hidden in the base, so applying a delta never rebuilds the base
+    def __init__(self, base: PlateIndex, names: Sequence[str], plates: Sequence[str], hidden: np.ndarray, cache_size: int = 4096) -> None:
+        super().__init__(cache_size)
+        self.base: PlateIndex = base
+        self.added: PlateIndex = PlateIndex(names, plates, 0)
+        self.hidden: np.ndarray = hidden
+        # positions past the base are the added keys
+        self.names: Sequence[str] = ChainedTable(base.names, names)
+        self.plates: Sequence[str] = ChainedTable(base.plates, plates)
+        self.visible: int = len(base) - int(hidden.sum()) + len(plates)
+
+    def __len__(self) -> int:
+        return self.visible
+
+    def search(self, query: str, score_cutoff: float) -> tuple[int, float]:
+        found, similarity = self.base.search(query, score_cutoff, self.hidden)
+        added, added_similarity = self.added.search(query, score_cutoff)
+        # the base comes first, so it wins ties like it would in an exhaustive scan
+        if added >= 0 and (found < 0 or added_similarity > similarity):
+            return len(self.base) + added, added_similarity
+        return found, similarity
+
+    def exhaustive(self, query: str) -> tuple[int, float]:
+        visible: dict[int, str] = {count: plate for count, plate in enumerate(self.plates) if count >= len(self.base) or not self.hidden[count]}
+        fuzzed = rapidfuzz.process.extractOne(query, visible)
+        return (fuzzed[2], fuzzed[1]) if fuzzed else (-1, 0.0)
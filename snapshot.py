@@ -0,0 +1,184 @@
+from __future__ import annotations
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import numpy as np
+from collections.abc import Iterator, Mapping, Sequence
+from packages.license_plate_recognition.common import character_replacements, number_replacements
+from packages.license_plate_recognition.matcher import IndexArrays, PlateIndex
+
+MAGIC: bytes = b"LPRSNAP3"
+ALIGNMENT: int = 64
+
+def snapshot_path(db_path: str) -> str:
+    return db_path + ".snapshot"
+
+def source_digest(data: bytes) -> str:
+    # a snapshot is only valid for the exact source file and the replacement tables it was normalised with
+    hasher = hashlib.blake2b(data, digest_size=32)
+    hasher.update(json.dumps([MAGIC.decode(), number_replacements, character_replacements]).encode("utf-8"))
+    return hasher.hexdigest()
+
+class StringTable(Sequence):
+    def __init__(self, blob: memoryview, offsets: np.ndarray) -> None:
+        self.blob: memoryview = blob
+        self.offsets: np.ndarray = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self[count] for count in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+class IndexedTable(Sequence):
+    def __init__(self, table: StringTable, indices: np.ndarray) -> None:
+        self.table: StringTable = table
+        self.indices: np.ndarray = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self[count] for count in range(*index.indices(len(self)))]
+        return self.table[self.indices[index]]
+
+class SnapshotPlates(Mapping):
+    # raw plates are looked up by binary search over their sorted order, so overlaying a delta never decodes them all
+    def __init__(self, plates: StringTable, names: IndexedTable, order: np.ndarray, keys: np.ndarray) -> None:
+        self.plates: StringTable = plates
+        self.names: IndexedTable = names
+        self.order: np.ndarray = order
+        # positions of the two normalised keys of every plate in the index
+        self.keys: np.ndarray = keys
+
+    def find(self, plate: str) -> int:
+        position: int = bisect.bisect_left(self.order, plate, key=lambda count: self.plates[count])
+        if position < len(self.order) and self.plates[self.order[position]] == plate:
+            return int(self.order[position])
+        return -1
+
+    def __len__(self) -> int:
+        return len(self.plates)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.plates)
+
+    def __getitem__(self, plate: str) -> str:
+        found: int = self.find(plate)
+        if found < 0:
+            raise KeyError(plate)
+        return self.names[found]
+
+    def __contains__(self, plate: object) -> bool:
+        return isinstance(plate, str) and self.find(plate) >= 0
+
+    def items(self) -> Iterator[tuple[str, str]]:
+        # in file order, without a search per plate
+        return zip(self.plates, self.names)
+
+def encode_strings(strings: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    blob: bytes = "".join(strings).encode("utf-8")
+    lengths: np.ndarray = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    if len(blob) != lengths.sum():
+        # multi-byte characters, fall back to measuring every encoded string
+        lengths = np.fromiter((len(string.encode("utf-8")) for string in strings), dtype=np.int64, count=len(strings))
+    offsets: np.ndarray = np.zeros(len(strings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    return np.frombuffer(blob, dtype=np.uint8), offsets
+
+def write_snapshot(path: str, digest: str, plates: Mapping[str, str], index: PlateIndex, keys: np.ndarray) -> None:
+    # one shared, deduplicated name table for the normalised keys and the raw plates
+    table, ids = np.unique(np.asarray([*index.names, *plates.values()], dtype=str), return_inverse=True)
+    arrays: dict[str, np.ndarray] = {
+        "key_names": ids[:len(index.names)].astype(np.uint32),
+        "plate_names": ids[len(index.names):].astype(np.uint32),
+        "keys": index.arrays.keys,
+        "lengths": index.arrays.lengths,
+        "counts": index.arrays.counts,
+        "unprunable": index.arrays.unprunable,
+        "ordered": index.arrays.ordered,
+        "plate_order": np.argsort(np.asarray(list(plates.keys()), dtype=str), kind="stable"),
+        "plate_keys": keys,
+    }
+    arrays["key_blob"], arrays["key_offsets"] = encode_strings(index.plates)
+    arrays["plate_blob"], arrays["plate_offsets"] = encode_strings(list(plates.keys()))
+    arrays["name_blob"], arrays["name_offsets"] = encode_strings(table.tolist())
+
+    layout: dict[str, tuple[str, tuple[int, ...], int]] = {}
+    offset: int = 0
+    for name, array in arrays.items():
+        layout[name] = (array.dtype.str, array.shape, offset)
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header: bytes = json.dumps({"digest": digest, "alphabet": index.arrays.alphabet, "arrays": layout}).encode("utf-8")
+    start: int = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    temporary: str = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(MAGIC)
+            snapshot.write(len(header).to_bytes(8, "little"))
+            snapshot.write(header)
+            for name, array in arrays.items():
+                snapshot.seek(start + layout[name][2])
+                snapshot.write(np.ascontiguousarray(array).tobytes())
+            snapshot.truncate(start + offset)
+        os.replace(temporary, path)
+    except BaseException:
+        # e.g. a full disk, no half written file is left next to the database
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+def read_snapshot(path: str, digest: str, cache_size: int) -> tuple[SnapshotPlates, PlateIndex] | None:
+    try:
+        with open(path, "rb") as snapshot:
+            buffer: mmap.mmap = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return parse_snapshot(buffer, digest, cache_size)
+    except (ValueError, KeyError, TypeError, IndexError):
+        # a truncated or corrupt snapshot is a miss like a stale one, it is rebuilt from the source
+        return None
+
+def parse_snapshot(buffer: mmap.mmap, digest: str, cache_size: int) -> tuple[SnapshotPlates, PlateIndex] | None:
+    if buffer[:len(MAGIC)] != MAGIC:
+        return None
+    length: int = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    header: dict = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + length])
+    if header["digest"] != digest:
+        return None
+    start: int = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+    view: memoryview = memoryview(buffer)
+    arrays: dict[str, np.ndarray] = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=start + offset).reshape(shape)
+
+    def table(name: str) -> StringTable:
+        blob: np.ndarray = arrays[f"{name}_blob"]
+        return StringTable(view[start + header["arrays"][f"{name}_blob"][2]:][:len(blob)], arrays[f"{name}_offsets"])
+
+    names: StringTable = table("name")
+    index: PlateIndex = PlateIndex(
+        IndexedTable(names, arrays["key_names"]),
+        table("key"),
+        cache_size,
+        IndexArrays(
+            alphabet=header["alphabet"],
+            keys=arrays["keys"],
+            lengths=arrays["lengths"],
+            counts=arrays["counts"],
+            unprunable=arrays["unprunable"],
+            ordered=arrays["ordered"],
+        ),
+    )
+    return SnapshotPlates(table("plate"), IndexedTable(names, arrays["plate_names"]), arrays["plate_order"], arrays["plate_keys"]), index
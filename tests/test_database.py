@@ -0,0 +1,122 @@
+from __future__ import annotations
+import json
+import os
+import pytest
+from packages.license_plate_recognition.common import double_replace
+from packages.license_plate_recognition.data import database as database_module
+from packages.license_plate_recognition.data.database import PlateDatabase
+from packages.license_plate_recognition.matcher import OverlayIndex
+from packages.license_plate_recognition.snapshot import SnapshotPlates, snapshot_path
+
+def write_json(path: str, data: dict[str, str]) -> None:
+    with open(path, "w") as db:
+        json.dump(data, db)
+
+def append_delta(path: str, *entries: tuple[str, str | None]) -> None:
+    with open(path, "a") as delta:
+        for plate, name in entries:
+            delta.write(json.dumps({"plate": plate, "name": name}) + "\n")
+    # a new mtime even where the filesystem clock is coarse
+    stat: os.stat_result = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def lookup(database: PlateDatabase, plate: str) -> str | None:
+    found, similarity = database.index.extract(double_replace(plate), 100)
+    return database.index.names[found] if found >= 0 else None
+
+@pytest.mark.parametrize("snapshots", [False, True])
+def test_removing_a_plate_keeps_others_with_the_same_key(tmp_path, snapshots: bool) -> None:
+    db: str = str(tmp_path / "guests.json")
+    # "AB10" and "AB1O" normalise to the same key
+    write_json(db, {"AB10": "Jane", "AB1O": "Jane", "XY15": "John", "XY1S": "Joan", "CD22": "Carl"})
+    PlateDatabase(db, db + ".delta", 0, snapshots).refresh()
+    database: PlateDatabase = PlateDatabase(db, db + ".delta", 0, snapshots)
+    database.refresh()
+    assert lookup(database, "XY15") == "Joan"
+
+    append_delta(db + ".delta", ("AB10", None), ("XY1S", None), ("CD22", None))
+    changes = database.refresh()
+    assert set(changes.removed) == {"AB10", "XY1S", "CD22"}
+    assert lookup(database, "AB10") == "Jane"
+    # the surviving plate now names the key
+    assert lookup(database, "XY15") == "John"
+    assert lookup(database, "CD22") is None
+
+    append_delta(db + ".delta", ("AB1O", None))
+    database.refresh()
+    assert lookup(database, "AB10") is None
+
+def test_last_user_stops_the_watcher(tmp_path) -> None:
+    db: str = str(tmp_path / "guests.json")
+    write_json(db, {"AB123": "Jane"})
+    first: PlateDatabase = PlateDatabase.get(db, db + ".delta", 0, False)
+    second: PlateDatabase = PlateDatabase.get(db, db + ".delta", 0, False)
+    assert first is second
+    first.refresh()
+    first.watch(0.1)
+    first.release()
+    assert first.thread.is_alive()
+    second.release()
+    assert not first.thread.is_alive()
+    fresh: PlateDatabase = PlateDatabase.get(db, db + ".delta", 0, False)
+    assert fresh is not first
+    fresh.release()
+    # a recognition function still holding on to the output starts it again
+    first.acquire()
+    assert first.thread.is_alive()
+    first.release()
+    assert not first.thread.is_alive()
+
+def test_truncated_snapshot_is_rebuilt_from_the_source(tmp_path) -> None:
+    db: str = str(tmp_path / "guests.json")
+    write_json(db, {"AB123": "Jane", "XY987": "John"})
+    PlateDatabase(db, db + ".delta", 0).refresh()
+    with open(snapshot_path(db), "r+b") as snapshot:
+        snapshot.truncate(100)
+    database: PlateDatabase = PlateDatabase(db, db + ".delta", 0)
+    database.refresh()
+    assert isinstance(database.base, dict)
+    assert lookup(database, "XY987") == "John"
+    # and the rewritten snapshot serves the next start
+    reloaded: PlateDatabase = PlateDatabase(db, db + ".delta", 0)
+    reloaded.refresh()
+    assert isinstance(reloaded.base, SnapshotPlates)
+    assert lookup(reloaded, "XY987") == "John"
+
+def test_partial_delta_line_waits_for_its_newline(tmp_path) -> None:
+    db: str = str(tmp_path / "guests.json")
+    write_json(db, {"AB123": "Jane"})
+    database: PlateDatabase = PlateDatabase(db, db + ".delta", 0, False)
+    database.refresh()
+    line: str = json.dumps({"plate": "XY987", "name": "John"}) + "\n"
+    # a writer caught halfway through appending its line
+    with open(db + ".delta", "w") as delta:
+        delta.write(line[:10])
+    assert not database.refresh()
+    assert lookup(database, "XY987") is None
+    with open(db + ".delta", "a") as delta:
+        delta.write(line[10:])
+    stat: os.stat_result = os.stat(db + ".delta")
+    os.utime(db + ".delta", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert set(database.refresh().added) == {"XY987"}
+    assert lookup(database, "XY987") == "John"
+
+def test_large_delta_is_compacted_into_the_base(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(database_module, "COMPACT_MINIMUM", 2)
+    db: str = str(tmp_path / "guests.json")
+    write_json(db, {"AB123": "Jane", "XY987": "John"})
+    database: PlateDatabase = PlateDatabase(db, db + ".delta", 0, False)
+    database.refresh()
+    append_delta(db + ".delta", ("CD456", "Carl"), ("XY987", None))
+    database.refresh()
+    assert not database.compacted and isinstance(database.index, OverlayIndex)
+    append_delta(db + ".delta", ("EF789", "Eve"))
+    database.refresh()
+    assert database.compacted and database.index is database.base_index and not database.overrides
+    assert [lookup(database, plate) for plate in ("AB123", "XY987", "CD456", "EF789")] == ["Jane", None, "Carl", "Eve"]
+    # replaying a truncated delta starts from the source file again, not from the compacted base
+    with open(db + ".delta", "w") as delta:
+        delta.write(json.dumps({"plate": "AB123", "name": None}) + "\n")
+    changes = database.refresh()
+    assert set(changes.removed) == {"AB123", "CD456", "EF789"} and set(changes.added) == {"XY987"}
+    assert [lookup(database, plate) for plate in ("AB123", "XY987", "CD456")] == [None, "John", None]
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import random
+import string
+import threading
+import numpy as np
+import pytest
+from packages.license_plate_recognition.matcher import OverlayIndex, PlateIndex
+
+ALPHABET: str = string.ascii_uppercase + string.digits
+
+def random_registry(rng: random.Random, size: int) -> list[str]:
+    # a small alphabet and mixed lengths so many keys share characters and every length bucket is pruned differently;
+    # repeated plates and plates with spaces cover tie-breaking and the unprunable keys
+    plates: list[str] = ["".join(rng.choices(ALPHABET[:14], k=rng.randint(3, 10))) for _ in range(size)]
+    plates += [f"{plate[:2]} {plate[2:]}" for plate in rng.sample(plates, size // 50)]
+    plates += rng.sample(plates, size // 20)
+    rng.shuffle(plates)
+    return plates
+
+def random_queries(rng: random.Random, plates: list[str], count: int) -> list[str]:
+    queries: list[str] = []
+    while len(queries) < count:
+        plate: str = rng.choice(plates)
+        position: int = rng.randrange(len(plate))
+        queries += [
+            plate,
+            plate[:position] + rng.choice(ALPHABET) + plate[position + 1:],
+            plate[:position] + plate[position + 1:],
+            plate + rng.choice(ALPHABET),
+            plate[: len(plate) // 2],
+            "".join(rng.choices(ALPHABET, k=rng.randint(2, 12))),
+            " ".join((plate[:3], plate[3:])),
+        ]
+    return queries[:count]
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("cutoff", [0, 50, 70, 80, 90, 95, 100])
+def test_extract_matches_exhaustive_scan(seed: int, cutoff: float) -> None:
+    rng: random.Random = random.Random(seed)
+    plates: list[str] = random_registry(rng, 600)
+    index: PlateIndex = PlateIndex([str(count) for count in range(len(plates))], plates)
+    for query in random_queries(rng, plates, 300):
+        found, similarity = index.extract(query, cutoff)
+        expected, expected_similarity = index.exhaustive(query)
+        if expected_similarity < cutoff:
+            assert found == -1, query
+        else:
+            assert (found, similarity) == (expected, expected_similarity), query
+
+def test_cached_results_match_fresh_ones() -> None:
+    rng: random.Random = random.Random(0)
+    plates: list[str] = random_registry(rng, 300)
+    queries: list[str] = random_queries(rng, plates, 200)
+    fresh: PlateIndex = PlateIndex(plates, plates, cache_size=0)
+    cached: PlateIndex = PlateIndex(plates, plates, cache_size=16)
+    for query in queries + queries:
+        assert cached.extract(query, 80) == fresh.extract(query, 80)
+    assert len(cached.cache) == 16
+
+def test_cache_is_safe_across_threads() -> None:
+    rng: random.Random = random.Random(1)
+    plates: list[str] = random_registry(rng, 300)
+    queries: list[str] = random_queries(rng, plates[:10], 50)
+    index: PlateIndex = PlateIndex(plates, plates, cache_size=8)
+    errors: list[BaseException] = []
+
+    def extract(seed: int) -> None:
+        local: random.Random = random.Random(seed)
+        try:
+            for _ in range(2000):
+                index.extract(local.choice(queries), 90)
+        except BaseException as e:
+            errors.append(e)
+    threads: list[threading.Thread] = [threading.Thread(target=extract, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(index.cache) <= 8
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("cutoff", [0, 70, 90, 100])
+def test_overlay_matches_exhaustive_scan(seed: int, cutoff: float) -> None:
+    rng: random.Random = random.Random(seed)
+    plates: list[str] = list(dict.fromkeys(random_registry(rng, 600)))
+    base: PlateIndex = PlateIndex([str(count) for count in range(len(plates))], plates)
+    hidden: np.ndarray = np.zeros(len(plates), dtype=bool)
+    hidden[rng.sample(range(len(plates)), 60)] = True
+    added: list[str] = random_registry(rng, 40)
+    index: OverlayIndex = OverlayIndex(base, added, added, hidden)
+    assert len(index) == len(plates) - 60 + len(added)
+    for query in random_queries(rng, plates + added, 300):
+        found, similarity = index.extract(query, cutoff)
+        expected, expected_similarity = index.exhaustive(query)
+        if expected_similarity < cutoff:
+            assert found == -1, query
+        else:
+            assert (found, similarity) == (expected, expected_similarity), query
+            assert found >= len(plates) or not hidden[found]
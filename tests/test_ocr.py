@@ -0,0 +1,65 @@
+from __future__ import annotations
+import numpy as np
+from packages.license_plate_recognition.algorithm.config import EasyOCRConfig
+from packages.license_plate_recognition.algorithm.ocr import MAX_CANVAS, letterbox, read_batch
+
+def test_letterbox_pads_small_crops_without_scaling() -> None:
+    small: np.ndarray = np.full((20, 60), 7, dtype=np.uint8)
+    large: np.ndarray = np.full((50, 200), 9, dtype=np.uint8)
+    batch, scales = letterbox([small, large])
+    assert batch.shape == (2, 50, 200)
+    assert scales == [(1.0, 1.0), (1.0, 1.0)]
+    assert (batch[0, :20, :60] == 7).all() and not batch[0, 20:].any() and not batch[0, :, 60:].any()
+
+def test_letterbox_caps_the_canvas() -> None:
+    huge: np.ndarray = np.zeros((MAX_CANVAS[0] * 2, MAX_CANVAS[1]), dtype=np.uint8)
+    small: np.ndarray = np.zeros((20, 60), dtype=np.uint8)
+    batch, scales = letterbox([huge, small])
+    assert batch.shape == (2, MAX_CANVAS[0], MAX_CANVAS[1])
+    assert scales[0] == (0.5, 0.5)
+    assert scales[1] == (1.0, 1.0)
+
+class Reader:
+    # detects one box around every bright pixel block and reads it as the block's value
+    def __init__(self) -> None:
+        self.recognized: list[tuple[int, ...]] = []
+
+    def detect(self, images: np.ndarray, reformat: bool, **parameters) -> tuple[list, list]:
+        horizontal_lists: list = []
+        for image in images:
+            ys, xs = np.nonzero(image[:, :, 0])
+            horizontal_lists.append([[int(xs.min()), int(xs.max()) + 1, int(ys.min()) - 2, int(ys.max()) + 3]] if len(ys) else [])
+        return horizontal_lists, [[] for _ in images]
+
+    def recognize(self, grey: np.ndarray, horizontal_list: list, free_list: list, reformat: bool, **parameters) -> list:
+        self.recognized.append(grey.shape)
+        results: list = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            y_min, y_max = max(0, y_min), min(grey.shape[0], y_max)
+            value: int = int(grey[y_min:y_max, x_min:x_max].max())
+            results.append(([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], str(value), value / 255))
+        return results
+
+def test_read_batch_recognizes_every_crop_in_one_call() -> None:
+    crops: list[np.ndarray] = []
+    for value, (height, width) in zip((10, 20, 30), ((30, 90), (60, 240), (24, 24))):
+        crop: np.ndarray = np.zeros((height, width), dtype=np.uint8)
+        crop[5:height - 5, 3:width - 3] = value
+        crops.append(crop)
+    # text down to the bottom edge of the tallest crop, its box must not reach into the next crop
+    crops[1][50:, 3:237] = 20
+    crops.append(np.zeros((40, 100), dtype=np.uint8))
+    reader: Reader = Reader()
+    results = read_batch(reader, crops, EasyOCRConfig(batch_size=8))
+    assert len(reader.recognized) == 1
+    assert [[text for _, text, _ in detections] for detections in results] == [["10"], ["20"], ["30"], []]
+    # boxes come back in the coordinates of their own crop, clipped to it like a crop of its own would be
+    assert results[0][0][0] == [[3, 3], [87, 3], [87, 27], [3, 27]]
+    assert results[1][0][0] == [[3, 3], [237, 3], [237, 60], [3, 60]]
+
+def test_read_batch_splits_by_batch_size() -> None:
+    crops: list[np.ndarray] = [np.full((10, 30), value, dtype=np.uint8) for value in (1, 2, 3)]
+    reader: Reader = Reader()
+    results = read_batch(reader, crops, EasyOCRConfig(batch_size=2))
+    assert len(reader.recognized) == 2
+    assert [[text for _, text, _ in detections] for detections in results] == [["1"], ["2"], ["3"]]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import struct
+import threading
+import time
+import pytest
+from packages.license_plate_recognition.algorithm.records import RecordWriter, encode_binary, encode_json, pack
+
+def packed(value: object) -> bytes:
+    out: bytearray = bytearray()
+    pack(value, out)
+    return bytes(out)
+
+@pytest.mark.parametrize("value, expected", [
+    (None, b"\xc0"),
+    (True, b"\xc3"),
+    (False, b"\xc2"),
+    (0, b"\x00"),
+    (127, b"\x7f"),
+    (-1, b"\xff"),
+    (-32, b"\xe0"),
+    (128, b"\xcf" + struct.pack(">Q", 128)),
+    (-33, b"\xd3" + struct.pack(">q", -33)),
+    (0.5, b"\xcb" + struct.pack(">d", 0.5)),
+    ("", b"\xa0"),
+    ("AB123", b"\xa5AB123"),
+    ("x" * 31, b"\xbf" + b"x" * 31),
+    ("x" * 32, b"\xd9\x20" + b"x" * 32),
+    ("x" * 256, b"\xda\x01\x00" + b"x" * 256),
+    ("é", b"\xa2\xc3\xa9"),
+    ([], b"\x90"),
+    ([1, "a"], b"\x92\x01\xa1a"),
+    ([0] * 16, b"\xdc\x00\x10" + b"\x00" * 16),
+    ({}, b"\x80"),
+    ({"a": None}, b"\x81\xa1a\xc0"),
+])
+def test_pack_encodes_msgpack(value: object, expected: bytes) -> None:
+    assert packed(value) == expected
+
+def test_pack_round_trips_through_msgpack() -> None:
+    msgpack = pytest.importorskip("msgpack")
+    record: dict = {"2024-01-01 00:00:00": [{"label": "Jane Doe", "known": True, "box": [1, 2, 300, 400], "ocr_score": 0.93, "track_id": None}] * 20}
+    assert msgpack.unpackb(packed(record), strict_map_key=False) == record
+
+def test_pack_rejects_unknown_types() -> None:
+    with pytest.raises(TypeError):
+        packed(object())
+
+def test_binary_records_are_length_prefixed() -> None:
+    records: list[dict] = [{"a": 1}, {"plate": "x" * 300}, {}]
+    stream: bytes = b"".join(encode_binary(record) for record in records)
+    offset: int = 0
+    for record in records:
+        length: int = int.from_bytes(stream[offset:offset + 4], "little")
+        assert stream[offset + 4:offset + 4 + length] == packed(record)
+        offset += 4 + length
+    assert offset == len(stream)
+
+class Sink:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay: float = delay
+        self.writes: list[tuple[float, bytes]] = []
+        self.active: int = 0
+        self.overlapped: bool = False
+        self.lock: threading.Lock = threading.Lock()
+
+    def __call__(self, data: bytes) -> None:
+        with self.lock:
+            self.active += 1
+            self.overlapped |= self.active > 1
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+            self.writes.append((time.monotonic(), data))
+
+def test_quiet_writer_flushes_on_its_timer() -> None:
+    sink: Sink = Sink()
+    writer: RecordWriter = RecordWriter(None, sink, "jsonl", 10, 1 << 20, 0.1)
+    started: float = time.monotonic()
+    writer.add({"a": 1})
+    time.sleep(0.3)
+    assert [data for _, data in sink.writes] == [encode_json({"a": 1})]
+    assert sink.writes[0][0] - started >= 0.09
+    writer.close()
+
+def test_size_flush_cancels_the_timer_of_its_batch() -> None:
+    sink: Sink = Sink()
+    writer: RecordWriter = RecordWriter(None, sink, "jsonl", 2, 1 << 20, 0.1)
+    writer.add({"a": 1})
+    writer.add({"a": 2})
+    assert len(sink.writes) == 1
+    writer.add({"a": 3})
+    # the timer of the first batch firing late must not cut the second batch short
+    writer.flush(1)
+    assert len(sink.writes) == 1
+    time.sleep(0.3)
+    assert [data for _, data in sink.writes] == [encode_json({"a": 1}) + encode_json({"a": 2}), encode_json({"a": 3})]
+    writer.close()
+
+def test_timer_and_size_flushes_never_overlap() -> None:
+    sink: Sink = Sink(delay=0.002)
+    writer: RecordWriter = RecordWriter(None, sink, "jsonl", 7, 1 << 20, 0.001)
+
+    def add(thread: int) -> None:
+        for count in range(200):
+            writer.add({"thread": thread, "count": count})
+            if count % 50 == 0:
+                time.sleep(0.005)
+    threads: list[threading.Thread] = [threading.Thread(target=add, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    assert not sink.overlapped
+    lines: list[bytes] = b"".join(data for _, data in sink.writes).splitlines(keepends=True)
+    assert sorted(lines) == sorted(encode_json({"thread": thread, "count": count}) for thread in range(4) for count in range(200))
+    # every thread's records arrive in the order it added them
+    for thread in range(4):
+        prefix: bytes = b'{"thread": %d,' % thread
+        assert [line for line in lines if line.startswith(prefix)] == [encode_json({"thread": thread, "count": count}) for count in range(200)]
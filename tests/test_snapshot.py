@@ -0,0 +1,42 @@
+from __future__ import annotations
+import numpy as np
+from packages.license_plate_recognition.matcher import PlateIndex
+from packages.license_plate_recognition.snapshot import ALIGNMENT, read_snapshot, snapshot_path, source_digest, write_snapshot
+
+PLATES: dict[str, str] = {"AB123": "Jane", "XY9": "John", "ÄÖ1": "Zoë", "CD 22": "Jane"}
+
+def write(path: str, digest: str) -> PlateIndex:
+    index: PlateIndex = PlateIndex(list(PLATES.values()), list(PLATES.keys()))
+    write_snapshot(path, digest, PLATES, index, np.arange(2 * len(PLATES), dtype=np.int64).reshape(-1, 2))
+    return index
+
+def test_round_trip(tmp_path) -> None:
+    path: str = snapshot_path(str(tmp_path / "guests.json"))
+    digest: str = source_digest(b"guests")
+    index: PlateIndex = write(path, digest)
+    snapshot = read_snapshot(path, digest, 16)
+    assert snapshot is not None
+    plates, loaded = snapshot
+    assert dict(plates.items()) == PLATES
+    assert plates["ÄÖ1"] == "Zoë" and "XY9" in plates and "XY8" not in plates
+    assert plates.keys.tolist() == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert list(loaded.plates) == list(index.plates) and list(loaded.names) == list(index.names)
+    for query in ("AB123", "AB12", "XY9", "ÄÖ", "CD22", "ZZZZZZ"):
+        assert loaded.extract(query, 60) == index.extract(query, 60)
+
+def test_stale_digest_is_a_miss(tmp_path) -> None:
+    path: str = snapshot_path(str(tmp_path / "guests.json"))
+    write(path, source_digest(b"guests"))
+    assert read_snapshot(path, source_digest(b"guests, edited"), 16) is None
+
+def test_truncated_file_is_a_miss(tmp_path) -> None:
+    path: str = snapshot_path(str(tmp_path / "guests.json"))
+    digest: str = source_digest(b"guests")
+    write(path, digest)
+    with open(path, "rb") as snapshot:
+        data: bytes = snapshot.read()
+    # inside the last array (its final block may be padding), halfway, inside the header, and an empty file
+    for length in (len(data) - ALIGNMENT, len(data) // 2, 20, 0):
+        with open(path, "wb") as snapshot:
+            snapshot.write(data[:length])
+        assert read_snapshot(path, digest, 16) is None
@@ -0,0 +1,39 @@
+from __future__ import annotations
+from packages.license_plate_recognition.algorithm.tracker import PlateTracker, Track
+
+def tracker() -> PlateTracker:
+    return PlateTracker(iou_threshold=0.3, max_age=15, min_confidence=0.8, reread_interval=2.0)
+
+def test_new_plate_in_the_old_box_gets_a_new_track() -> None:
+    plates: PlateTracker = tracker()
+    old: Track = plates.update([(100, 100, 300, 160)])[0]
+    assert plates.vote(old, "KEY8KNA", 0.9, 0.0) is old
+    # another plate of the same size drives into the box before the old track expires
+    same: Track = plates.update([(110, 104, 310, 164)])[0]
+    assert same is old
+    new: Track = plates.vote(same, "DQN5RJ", 0.9, 2.5)
+    assert new is not old
+    assert new.track_id != old.track_id
+    assert (new.license_plate, new.votes) == ("DQN5RJ", {"DQN5RJ": 0.9})
+    assert old.latest() is new
+    assert plates.update([(112, 106, 312, 166)]) == [new]
+    assert old.track_id not in plates.tracks
+
+def test_misreads_stay_on_the_track() -> None:
+    plates: PlateTracker = tracker()
+    track: Track = plates.update([(100, 100, 300, 160)])[0]
+    plates.vote(track, "KEY8KNA", 0.9, 0.0)
+    # one confused character, or an unsure read, is a vote and not a different plate
+    assert plates.vote(track, "KEYBKNA", 0.9, 2.0) is track
+    assert plates.vote(track, "XY12", 0.5, 4.0) is track
+    assert track.license_plate == "KEY8KNA"
+
+def test_box_shape_jump_starts_a_new_track() -> None:
+    plates: PlateTracker = tracker()
+    old: Track = plates.update([(100, 100, 300, 160)])[0]
+    plates.vote(old, "KEY8KNA", 0.9, 0.0)
+    # overlapping, but far wider: a longer plate, not the same one moving
+    new: Track = plates.update([(100, 100, 420, 160)])[0]
+    assert new is not old
+    assert new.license_plate == ""
+    assert plates.needs_read(new, 0.1)